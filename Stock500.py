@@ -1,16 +1,17 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Tuple
 import pandas as pd
-from functools import reduce
-
-import rqdatac as rq
 
 from factorbase.factor import Factor, SecurityType, Frequency, FactorType
 
+from common.factor_store import factor_store
+from common.membership import index_membership
+from common.panel import typed_panel
+
 
 class Stock500(Factor):
     def __init__(self):
-        rq.init()
+        pass
 
     def factor_name(self) -> str:
         return "Stock500"
@@ -41,18 +42,8 @@ class Stock500(Factor):
 
     @Factor.checker
     def run(self, start_time: datetime, end_time: datetime) -> Tuple[pd.DataFrame, Exception]:
-        cs = rq.index_components(
-            '000905.XSHG', start_date=start_time, end_date=end_time)
-
-        index = pd.Series(data=cs.keys(), name='datetime')
-        codes = sorted(list(reduce(lambda a, b: set(a) | set(b), cs.values())))
-
-        df = pd.DataFrame(index=index, columns=['gen_time'] + codes)
-        df['gen_time'] = df.index.map(lambda x: x + timedelta(hours=0))
-
-        for dt in index:
-            df.loc[dt, cs[dt]] = 1
-        df = df.fillna(0)
+        df = index_membership('000905.XSHG', start_time, end_time)
+        df = typed_panel(df, FactorType.POOL)
         return df, None
 
 
@@ -66,4 +57,4 @@ if __name__ == '__main__':
         exit(-1)
 
     print(df, err)
-    df.to_pickle("Stock500.pkl")
+    factor_store.write("Stock500", df)
@@ -1,10 +1,12 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Tuple
 import pandas as pd
-import os
 
 from factorbase.factor import Factor, SecurityType, Frequency, FactorType
 
+from common.barra import exposure_frame
+from common.factor_store import factor_store
+
 
 class StockBarraBookToPrice(Factor):
     def __init__(self):
@@ -39,30 +41,7 @@ class StockBarraBookToPrice(Factor):
 
     @Factor.checker
     def run(self, start_time: datetime, end_time: datetime) -> Tuple[pd.DataFrame, Exception]:
-        factor_name = 'book_to_price'
-        src = '/mnt/Q/users/liujianyu/risk_management/exposures'
-        rows = []
-        for file in sorted(os.listdir(src)):
-            dt = datetime.strptime(file[:-4], '%Y%m%d')
-            if dt < start_time or dt > end_time:
-                continue
-            file_path = os.path.join(src, file)
-            df = pd.read_csv(file_path)
-            df['stock_code'] = df['stock_code'].map(lambda x: x[2:] + '.' + ('XSHG' if x[:2]== 'SH' else 'XSHE'))
-            df = df.set_index(['stock_code'])
-            
-            row = df[factor_name].copy()
-            row['datetime'] = dt
-            row = row.to_frame().T
-            rows.append(row)
-        
-        df = pd.concat(rows,axis=0).set_index(['datetime'])
-        df['gen_time'] = df.index.map(lambda dt: dt + timedelta(hours=15))
-        
-        columns = sorted(list(df.columns))
-        columns.remove('gen_time')
-        df = df[['gen_time'] + columns]
-        
+        df = exposure_frame('book_to_price', start_time, end_time)
         return df, None
         
 
@@ -77,5 +56,5 @@ if __name__ == '__main__':
         exit(-1)
     
     print(df, err)
-    df.to_pickle("StockBarraBookToPrice.pkl")
+    factor_store.write("StockBarraBookToPrice", df)
         
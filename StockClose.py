@@ -2,14 +2,17 @@ from datetime import datetime, timedelta
 from typing import List, Tuple
 import pandas as pd
 
-import rqdatac as rq
-
 from factorbase.factor import Factor, SecurityType, Frequency, FactorType
 
+from common.factor_store import factor_store
+from common.panel import typed_panel
+from common.price_store import price_history
+from common.rqfetch import instrument_codes
+
 
 class StockClose(Factor):
     def __init__(self):
-        rq.init()
+        pass
     
     def factor_name(self) -> str:
         return "StockClose"
@@ -40,24 +43,10 @@ class StockClose(Factor):
 
     @Factor.checker
     def run(self, start_time: datetime, end_time: datetime) -> Tuple[pd.DataFrame, Exception]:
-        codes = rq.all_instruments(type="Stock")['order_book_id'].to_list()
-        codes = sorted(list(codes))
+        codes = instrument_codes('Stock')
         
-        df_px = rq.get_price(codes,
-                          start_date=start_time.strftime('%Y-%m-%d'),
-                          end_date=end_time.strftime('%Y-%m-%d'),
-                          frequency='1d',
-                          adjust_type='none',
-                          fields=['close'])
-               
-        df = pd.DataFrame(index=df_px.index.levels[1].rename('datetime'), columns=['gen_time'] + codes)
-        for code in codes:
-            try:
-                df[code] = df_px.loc[code]
-            except:
-                pass
-            print(code)
-        df['gen_time'] = df.index.map(lambda x: x + timedelta(hours=15))
+        df = price_history('close', start_time, end_time, codes)
+        df = typed_panel(df, FactorType.NORMAL, timedelta(hours=15))
             
         return df, None
 
@@ -73,5 +62,5 @@ if __name__ == '__main__':
         exit(-1)
     
     print(df, err)
-    df.to_pickle("StockClose.pkl")
+    factor_store.write("StockClose", df)
     
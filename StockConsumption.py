@@ -1,17 +1,22 @@
 import os
 from datetime import datetime, timedelta
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import pandas as pd
-import rqdatac as rq
 
 from factorbase.factor import Factor, SecurityType, Frequency, FactorType
 
+from common.align import align_to_trading_days
+from common.codes import rq_rename_map
+from common.factor_store import factor_store
+from common.panel import typed_panel
+from common.result_files import ResultFileStore
+
 
 class StockConsumption(Factor):
 
     def __init__(self):
-        rq.init()
+        pass
 
     def factor_name(self) -> str:
         return "StockConsumption"
@@ -57,89 +62,25 @@ class StockConsumption(Factor):
                 src_path = '/'.join((origin_dir, name))
                 break
 
-        src_df = pd.read_csv(src_path)
-        # src_df = pd.read_csv('./20230508.csv')
+        store = ResultFileStore('StockConsumption', self.column_map)
+        store.ingest(src_path)
+        df = store.frame(start_time, end_time)
+
+        # the latest consumption data stays in force until the next file, so carry it up to today
+        new_df = align_to_trading_days(df, start_time, end_time, extend_to=datetime.now())
+        df = typed_panel(new_df, FactorType.POOL)
+        # print(df)
 
-        columns = src_df.columns.to_list()
+        return df, None
 
-        new_column_dict = {}
+    def column_map(self, columns: List[str]) -> Dict[str, str]:
+        new_column_dict = rq_rename_map(columns)
 
         for col_name in columns:
             if 'named' in col_name:
                 new_column_dict[col_name] = 'datetime'
 
-            else:
-                if col_name.endswith('.SZ'):
-                    new_column_dict[col_name] = col_name.replace('.SZ', '.XSHE')
-
-                elif col_name.endswith('.SH'):
-                    new_column_dict[col_name] = col_name.replace('.SH', '.XSHG')
-
-        df = src_df.rename(columns=new_column_dict)
-        df.sort_values(by='datetime', inplace=True)
-        # print(df)
-
-        first_row = df.head(1)
-        last_row = df.tail(1)
-        csv_start_str = first_row.at[0, 'datetime']
-        csv_end_str = last_row.iloc[-1]['datetime']
-
-        csv_start_time_obj = datetime.strptime(csv_start_str, '%Y-%m-%d')
-        csv_end_time_obj = datetime.strptime(csv_end_str, '%Y-%m-%d')
-
-        now_time_obj = datetime.now()
-        if now_time_obj > csv_end_time_obj:
-            csv_end_time_obj = now_time_obj
-
-        # print(csv_start_time_obj, csv_end_time_obj)
-
-        resp = rq.get_trading_dates(
-            start_date=csv_start_time_obj,
-            end_date=csv_end_time_obj
-        )
-        trading_date_str_list = [i.strftime('%Y-%m-%d') for i in resp]
-        # trading_date_str_list = ['2023-04-19']
-
-        df_columns = df.columns.to_list()
-        df_columns.remove('datetime')
-
-        df_table = pd.DataFrame(
-            index=trading_date_str_list,
-            columns=df_columns
-        )
-        df_table.index.name = 'datetime'
-
-        df = df.set_index('datetime')
-        df_index_datetime_list = df.index.to_list()
-
-        for i in df_index_datetime_list:
-            df_table.loc[i] = df.loc[i].copy()
-        new_df = df_table
-        new_df.sort_values(by='datetime', inplace=True)
-        # print(new_df)
-
-        new_df.fillna(axis=0, method='ffill', inplace=True)
-
-        new_index_str_set = set(new_df.index.to_list())
-        trading_date_str_set = set(trading_date_str_list)
-
-        drop_row_index_list = new_index_str_set - trading_date_str_set
-        for i in drop_row_index_list:
-            new_df.drop(index=i, inplace=True)
-
-        df = new_df.reset_index()
-
-        df.insert(0, 'gen_time', df['datetime'].copy())
-        datetime_col = df['datetime'].astype('datetime64')
-        gen_time_col = df['gen_time'].astype('datetime64')
-
-        df['datetime'] = datetime_col
-        df['gen_time'] = gen_time_col
-
-        df = df.set_index('datetime')
-        # print(df)
-
-        return df, None
+        return new_column_dict
 
 
 if __name__ == '__main__':
@@ -154,4 +95,4 @@ if __name__ == '__main__':
         exit(-1)
 
     print(df, err)
-    df.to_pickle("StockConsumption.pkl")
+    factor_store.write("StockConsumption", df)
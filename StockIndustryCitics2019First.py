@@ -2,14 +2,17 @@ from datetime import datetime, timedelta
 from typing import List, Tuple
 import pandas as pd
 
-import rqdatac as rq
-
 from factorbase.factor import Factor, SecurityType, Frequency, FactorType
 
+from common.factor_store import factor_store
+from common.industry import IndustryHistory
+from common.panel import typed_panel
+from common.rqfetch import instrument_codes
+
 
 class StockIndustryCitics2019First(Factor):
     def __init__(self):
-        rq.init()
+        pass
     
     def factor_name(self) -> str:
         return "StockIndustryCitics2019First"
@@ -24,7 +27,7 @@ class StockIndustryCitics2019First(Factor):
         return datetime(2010,1,1)
     
     def desc(self)->str:
-        return "stock citics first level industry"
+        return "stock citics first level industry code, names in attrs['categories']"
 
     @Factor.checker
     def frequency(self) -> Frequency:
@@ -40,23 +43,10 @@ class StockIndustryCitics2019First(Factor):
 
     @Factor.checker
     def run(self, start_time: datetime, end_time: datetime) -> Tuple[pd.DataFrame, Exception]:
-        codes = rq.all_instruments(type="Stock")['order_book_id'].to_list()
-        codes = sorted(list(codes))
-        
-        trade_days = rq.get_trading_dates(start_date=start_time, end_date=end_time)
-        trade_days = sorted(list(map(lambda day: datetime(day.year, day.month, day.day), trade_days)))
-        
-        df = pd.DataFrame(index=trade_days, columns=['gen_time']+codes)
+        codes = instrument_codes('Stock')
         
-        for trade_day in trade_days:
-            df_indu = rq.get_instrument_industry(order_book_ids=codes,
-                                            date=trade_day,
-                                            level=1,
-                                            source='citics_2019')
-            df.loc[trade_day] = df_indu['first_industry_name']
-            
-        df.index = df.index.rename("datetime")            
-        df['gen_time'] = df.index
+        df = IndustryHistory('citics_2019', level=1).code_panel(start_time, end_time, codes)
+        df = typed_panel(df, FactorType.INDUSTRY)
         return df, None
 
 
@@ -71,5 +61,5 @@ if __name__ == '__main__':
         exit(-1)
     
     print(df, err)
-    df.to_pickle("StockIndustryCitics2019First.pkl")
+    factor_store.write("StockIndustryCitics2019First", df)
     
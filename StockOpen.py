@@ -2,14 +2,17 @@ from datetime import datetime, timedelta
 from typing import List, Tuple
 import pandas as pd
 
-import rqdatac as rq
-
 from factorbase.factor import Factor, SecurityType, Frequency, FactorType
 
+from common.factor_store import factor_store
+from common.panel import typed_panel
+from common.rqfetch import instrument_codes
+from common.snapshot import is_trading_time, snapshot_hub, unadjusted_opens
+
 
 class StockOpen(Factor):
     def __init__(self):
-        rq.init()
+        pass
     
     def factor_name(self) -> str:
         return "StockOpen"
@@ -40,62 +43,23 @@ class StockOpen(Factor):
 
     @Factor.checker
     def run(self, start_time: datetime, end_time: datetime) -> Tuple[pd.DataFrame, Exception]:
-        codes = rq.all_instruments(type="Stock")['order_book_id'].to_list()
-        codes = sorted(list(codes))
+        codes = instrument_codes('Stock')
         
-        df_px = rq.get_price(codes,
-                          start_date=start_time.strftime('%Y-%m-%d'),
-                          end_date=end_time.strftime('%Y-%m-%d'),
-                          frequency='1d',
-                          adjust_type='none',
-                          fields=['open'])
+        df = unadjusted_opens(codes, start_time, end_time)
 
         now_datetime = datetime.now()
-        now_datetime_str = now_datetime.strftime('%Y-%m-%d')
 
-        today_open_price_dict = {}
         if now_datetime.date() <= end_time.date() and self.is_trading_time():
-            today_tick_obj_list = rq.current_snapshot(codes)
-
-            for tick_obj in today_tick_obj_list:
-                today_open_price_dict[tick_obj.order_book_id] = tick_obj.open
+            today_open_prices = snapshot_hub.opens(codes)
+            if len(today_open_prices):
+                df.loc[pd.Timestamp(now_datetime.date())] = today_open_prices
 
-        if today_open_price_dict:
-            for stock_code, open_price in today_open_price_dict.items():
-                df_px.loc[(stock_code, now_datetime_str), 'open'] = open_price
-
-        df = pd.DataFrame(index=df_px.index.levels[1].rename('datetime'), columns=['gen_time'] + codes)
-        for code in codes:
-            try:
-                df[code] = df_px.loc[code]
-            except:
-                pass
-        df['gen_time'] = df.index.map(lambda x: x + timedelta(hours=9,minutes=30))
+        df = typed_panel(df, FactorType.NORMAL, timedelta(hours=9, minutes=30))
             
         return df, None
 
     def is_trading_time(self):
-
-        now_datetime = datetime.now()
-
-        morning_open_start = datetime(year=now_datetime.year, month=now_datetime.month, day=now_datetime.day,
-                                      hour=9, minute=30)
-
-        morning_open_end = datetime(year=now_datetime.year, month=now_datetime.month, day=now_datetime.day,
-                                    hour=11, minute=30)
-
-        afternoon_open_start = datetime(year=now_datetime.year, month=now_datetime.month, day=now_datetime.day,
-                                        hour=13, minute=0)
-
-        afternoon_open_end = datetime(year=now_datetime.year, month=now_datetime.month, day=now_datetime.day,
-                                      hour=15, minute=0)
-
-        if now_datetime.weekday() <= 4 and \
-                (morning_open_start <= now_datetime <= morning_open_end or
-                 afternoon_open_start <= now_datetime <= afternoon_open_end):
-            return True
-
-        return False
+        return is_trading_time()
 
 
 
@@ -109,5 +73,5 @@ if __name__ == '__main__':
         exit(-1)
     
     print(df, err)
-    df.to_pickle("StockOpen.pkl")
+    factor_store.write("StockOpen", df)
     
@@ -1,15 +1,18 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Tuple
 import pandas as pd
 
-import rqdatac as rq
-
 from factorbase.factor import Factor, SecurityType, Frequency, FactorType
 
+from common.factor_store import factor_store
+from common.panel import typed_panel
+from common.rqfetch import instrument_codes
+from common.session import rq
+
 
 class StockST(Factor):
     def __init__(self):
-        rq.init()
+        pass
     
     def factor_name(self) -> str:
         return "StockST"
@@ -40,17 +43,11 @@ class StockST(Factor):
 
     @Factor.checker
     def run(self, start_time: datetime, end_time: datetime) -> Tuple[pd.DataFrame, Exception]:
-        codes = rq.all_instruments(type="Stock")['order_book_id'].to_list()
-        codes = sorted(list(codes))
+        codes = instrument_codes('Stock')
         
         df = rq.is_st_stock(codes, start_date=start_time, end_date=end_time)
         codes = sorted(list(df.columns))
-        df = df.astype(int)
-        
-        df['gen_time'] = df.index.map(lambda x: x + timedelta(hours=0))
-        
-        df = df[['gen_time'] + codes]
-        df.index.name = 'datetime'
+        df = typed_panel(df[codes], FactorType.POOL)
             
         return df, None
 
@@ -66,5 +63,5 @@ if __name__ == '__main__':
         exit(-1)
     
     print(df, err)
-    df.to_pickle("StockST.pkl")
+    factor_store.write("StockST", df)
     
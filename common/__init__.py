@@ -0,0 +1,54 @@
+import json
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from typing import Any, IO, Iterator
+
+
+CACHE_ROOT = os.environ.get('FACTOR_CACHE_DIR', os.path.expanduser('~/.cache/factor_public'))
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = 'w') -> Iterator[IO]:
+    """open() for a file that readers only ever see whole.
+
+    Writes go to a temporary file private to this process and thread, which replaces path once
+    the block exits cleanly and is removed otherwise.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = '%s.tmp.%d.%d' % (path, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp, mode) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def load_json(path: str, default: Any = None) -> Any:
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(path: str, obj: Any):
+    with atomic_open(path) as f:
+        json.dump(obj, f)
+
+
+def load_pickle(path: str, default: Any = None) -> Any:
+    if not os.path.exists(path):
+        return default
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_pickle(path: str, obj: Any):
+    with atomic_open(path, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+from common.trading_calendar import trading_calendar
+
+
+def align_to_trading_days(df: pd.DataFrame, start_time: datetime, end_time: datetime,
+                          extend_to: datetime = None, limit: Optional[int] = None) -> pd.DataFrame:
+    """Align a panel indexed by (string or datetime) dates to the trading days in [start_time, end_time].
+
+    The dates are parsed once and the panel is reindexed onto the union of its own dates and the
+    trading days from its first date to its last date, or to `extend_to` if later. It is then
+    forward-filled, so a row dated on a non-trading day carries over to the next trading day,
+    and only trading days are kept. limit caps how many consecutive rows a value is carried.
+    """
+    df = df.set_axis(pd.to_datetime(df.index)).sort_index()
+    df = df[~df.index.duplicated(keep='last')]
+    if not len(df):
+        return df.rename_axis('datetime')
+
+    last = df.index[-1] if extend_to is None else max(df.index[-1], pd.Timestamp(extend_to))
+    days = trading_calendar.trading_dates(df.index[0], last)
+    df = df.reindex(df.index.union(days)).ffill(limit=limit).reindex(days)
+    df.index.name = 'datetime'
+    return df.loc[start_time:end_time]
@@ -0,0 +1,180 @@
+import os
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from factorbase.factor import FactorType
+
+from common import CACHE_ROOT, load_json, save_json
+from common.codes import to_rq
+from common.columnar import MonthlyColumnStore
+from common.csv_reader import read_wide_csv
+from common.panel import typed_panel
+
+
+EXPOSURE_DIR = '/mnt/Q/users/liujianyu/risk_management/exposures'
+CACHE_DIR = os.path.join(CACHE_ROOT, 'barra')
+
+# backfills parse files on a bounded process pool; a daily top-up of a file or two stays serial
+MAX_WORKERS = 8
+PARALLEL_MIN_FILES = 32
+
+BARRA_COLUMNS = [
+    'beta',
+    'size',
+    'nlsize',
+    'momentum',
+    'liquidity',
+    'leverage',
+    'earnings_yield',
+    'book_to_price',
+    'residual_volatility',
+]
+
+# every StockBarra* factor run in the same process with the same range shares one directory scan
+_ingested: Set[Tuple[str, str, datetime, datetime]] = set()
+
+
+def _read_exposure_file(file_path: str) -> pd.DataFrame:
+    # already running one file per worker process, so no extra parse threads
+    df = read_wide_csv(file_path, 'stock_code', BARRA_COLUMNS, dtype=np.float64, parse_dates=False, threads=1)
+    df.index = to_rq(df.index).rename('stock_code')
+    return df
+
+
+def _parse_exposure_file(file_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    df = _read_exposure_file(file_path)
+    return df.index.to_numpy(), df[BARRA_COLUMNS].to_numpy(dtype=np.float64)
+
+
+def parse_exposure_files(file_paths: List[str], workers: int = 1) -> Tuple[List[str], np.ndarray]:
+    """Parse exposure files into a (column, file, code) cube over the sorted union of codes."""
+    if workers > 1 and len(file_paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(_parse_exposure_file, file_paths,
+                                   chunksize=max(1, len(file_paths) // (workers * 4))))
+    else:
+        parsed = [_parse_exposure_file(file_path) for file_path in file_paths]
+
+    codes = pd.Index(sorted(set().union(*(file_codes for file_codes, _ in parsed))))
+    cube = np.full((len(BARRA_COLUMNS), len(file_paths), len(codes)), np.nan)
+    for i, (file_codes, values) in enumerate(parsed):
+        cube[:, i, codes.get_indexer(file_codes)] = values.T
+    return codes.to_list(), cube
+
+
+def _list_exposure_files(src: str) -> Tuple[List[datetime], List[str]]:
+    files = sorted(os.listdir(src))
+    dts = [datetime.strptime(file[:-4], '%Y%m%d') for file in files]
+    return dts, files
+
+
+class ExposureStore:
+    """Columnar store of the Barra exposures converted from the daily CSV drops.
+
+    Exposures live in a MonthlyColumnStore with one float64 column per Barra factor.
+    manifest.json maps every ingested file name to its [size, mtime], so each CSV is
+    parsed once unless it changes on the share.
+    """
+
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self.store = MonthlyColumnStore(root, BARRA_COLUMNS)
+
+    def _load_manifest(self) -> Dict[str, list]:
+        return load_json(self.manifest_path, {})
+
+    def _save_manifest(self, manifest: Dict[str, list]):
+        save_json(self.manifest_path, manifest)
+
+    def ingest(self, src: str, start_time: datetime, end_time: datetime, workers: int = None):
+        """Convert the exposure files in [start_time, end_time] that are new or changed since the last ingestion.
+
+        workers bounds the process pool used to parse them; by default a pool is only
+        started for backfills of at least PARALLEL_MIN_FILES files.
+        """
+        dts, files = _list_exposure_files(src)
+        lo = bisect_left(dts, start_time)
+        hi = bisect_right(dts, end_time)
+
+        manifest = self._load_manifest()
+
+        listed = set(files)
+        removed = [file for file in manifest if file not in listed]
+        stale = []
+        for dt, file in zip(dts[lo:hi], files[lo:hi]):
+            st = os.stat(os.path.join(src, file))
+            key = [st.st_size, st.st_mtime]
+            if manifest.get(file) != key:
+                stale.append((dt, file, key))
+
+        if not removed and not stale:
+            return
+
+        if workers is None:
+            workers = min(MAX_WORKERS, os.cpu_count() or 1) if len(stale) >= PARALLEL_MIN_FILES else 1
+        stale_dts = pd.DatetimeIndex([dt for dt, _, _ in stale], name='datetime')
+        codes, cube = parse_exposure_files([os.path.join(src, file) for _, file, _ in stale], workers)
+
+        frames = {column: pd.DataFrame(cube[k], index=stale_dts, columns=codes)
+                  for k, column in enumerate(BARRA_COLUMNS)}
+        self.store.upsert(frames, [datetime.strptime(file[:-4], '%Y%m%d') for file in removed])
+
+        for file in removed:
+            del manifest[file]
+        for _, file, key in stale:
+            manifest[file] = key
+        self._save_manifest(manifest)
+
+    def read(self, columns: List[str], start_time: datetime, end_time: datetime) -> Dict[str, pd.DataFrame]:
+        return self.store.read(columns, start_time, end_time)
+
+
+def _with_gen_time(df: pd.DataFrame) -> pd.DataFrame:
+    return typed_panel(df, FactorType.RISK, timedelta(hours=15))
+
+
+def load_exposures(start_time: datetime, end_time: datetime, columns: List[str] = BARRA_COLUMNS,
+                   src: str = EXPOSURE_DIR, cache_dir: str = CACHE_DIR, workers: int = None) -> Dict[str, pd.DataFrame]:
+    store = ExposureStore(cache_dir)
+    key = (src, cache_dir, start_time, end_time)
+    if key not in _ingested:
+        store.ingest(src, start_time, end_time, workers)
+        _ingested.add(key)
+    return {column: _with_gen_time(df) for column, df in store.read(columns, start_time, end_time).items()}
+
+
+def exposure_frame(column: str, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+    return load_exposures(start_time, end_time, [column])[column]
+
+
+if __name__ == '__main__':
+    from common.factor_store import factor_store
+    from StockBarraBeta import StockBarraBeta
+    from StockBarraBookToPrice import StockBarraBookToPrice
+    from StockBarraEarningsYield import StockBarraEarningsYield
+    from StockBarraLeverage import StockBarraLeverage
+    from StockBarraLiquidity import StockBarraLiquidity
+    from StockBarraMomentum import StockBarraMomentum
+    from StockBarraNLSize import StockBarraNLSize
+    from StockBarraResidualVolatility import StockBarraResidualVolatility
+    from StockBarraSize import StockBarraSize
+
+    now = datetime.now()
+    factors = [StockBarraBeta(), StockBarraSize(), StockBarraNLSize(), StockBarraMomentum(), StockBarraLiquidity(),
+               StockBarraLeverage(), StockBarraEarningsYield(), StockBarraBookToPrice(),
+               StockBarraResidualVolatility()]
+    for factor in factors:
+        try:
+            df, err = factor.run(datetime(2010, 1, 1), now)
+        except Exception as e:
+            print("error: ", e)
+            exit(-1)
+
+        print(factor.factor_name(), df, err)
+        factor_store.write(factor.factor_name(), df)
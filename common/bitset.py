@@ -0,0 +1,83 @@
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class PoolBitset:
+    """Pool membership packed to one bit per (date, code): one np.packbits row per date over a code axis.
+
+    &, | and - (and-not) align both operands on the union of their dates and codes, treating
+    missing cells as non-members, then combine the packed bytes directly.
+    """
+
+    def __init__(self, bits: np.ndarray, dates: pd.DatetimeIndex, codes: pd.Index):
+        self.bits = bits
+        self.dates = pd.DatetimeIndex(dates, name='datetime')
+        self.codes = pd.Index(codes)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'PoolBitset':
+        """Pack a POOL factor frame; any non-zero, non-NaN cell is a member and gen_time is ignored."""
+        values = df.drop(columns=['gen_time'], errors='ignore')
+        mask = values.fillna(0).to_numpy() != 0
+        return cls(np.packbits(mask, axis=1), values.index, values.columns)
+
+    def to_mask(self) -> np.ndarray:
+        return np.unpackbits(self.bits, axis=1, count=len(self.codes)).astype(bool)
+
+    def to_frame(self) -> pd.DataFrame:
+        mask = np.unpackbits(self.bits, axis=1, count=len(self.codes))
+        return pd.DataFrame(mask, index=self.dates, columns=self.codes)
+
+    def reindex(self, dates: Iterable = None, codes: Iterable = None) -> 'PoolBitset':
+        dates = self.dates if dates is None else pd.DatetimeIndex(dates)
+        codes = self.codes if codes is None else pd.Index(codes)
+        if dates.equals(self.dates) and codes.equals(self.codes):
+            return self
+        rows = self.dates.get_indexer(dates)
+        cols = self.codes.get_indexer(codes)
+        mask = np.zeros((len(dates), len(codes)), dtype=bool)
+        src = self.to_mask()
+        found_rows = rows >= 0
+        found_cols = cols >= 0
+        mask[np.ix_(found_rows, found_cols)] = src[np.ix_(rows[found_rows], cols[found_cols])]
+        return PoolBitset(np.packbits(mask, axis=1), dates, codes)
+
+    def _aligned(self, other: 'PoolBitset'):
+        dates = self.dates.union(other.dates)
+        codes = self.codes.union(other.codes)
+        return self.reindex(dates, codes), other.reindex(dates, codes)
+
+    def __and__(self, other: 'PoolBitset') -> 'PoolBitset':
+        a, b = self._aligned(other)
+        return PoolBitset(a.bits & b.bits, a.dates, a.codes)
+
+    def __or__(self, other: 'PoolBitset') -> 'PoolBitset':
+        a, b = self._aligned(other)
+        return PoolBitset(a.bits | b.bits, a.dates, a.codes)
+
+    def __sub__(self, other: 'PoolBitset') -> 'PoolBitset':
+        a, b = self._aligned(other)
+        return PoolBitset(a.bits & ~b.bits, a.dates, a.codes)
+
+    def count(self) -> pd.Series:
+        """Number of members per date."""
+        return pd.Series(_POPCOUNT[self.bits].sum(axis=1, dtype=np.int64), index=self.dates)
+
+    def members(self, dt) -> pd.Index:
+        row = self.bits[self.dates.get_loc(pd.Timestamp(dt))]
+        return self.codes[np.unpackbits(row, count=len(self.codes)).astype(bool)]
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            np.savez(f, bits=self.bits, dates=self.dates.to_numpy(dtype='datetime64[ns]'),
+                     codes=self.codes.to_numpy(dtype=str))
+
+    @classmethod
+    def load(cls, path: str) -> 'PoolBitset':
+        with np.load(path) as data:
+            return cls(data['bits'], pd.DatetimeIndex(data['dates']), pd.Index(data['codes'].tolist()))
@@ -0,0 +1,59 @@
+from typing import Dict, Iterable
+
+import pandas as pd
+
+
+# vendor exchange tags -> (prefix/suffix tag, rqdatac exchange)
+EXCHANGES = {
+    'SH': ('SH', 'XSHG'),
+    'SZ': ('SZ', 'XSHE'),
+    'BJ': ('BJ', 'BJSE'),
+    'XSHG': ('SH', 'XSHG'),
+    'XSHE': ('SZ', 'XSHE'),
+    'BJSE': ('BJ', 'BJSE'),
+}
+
+STYLES = ('rq', 'prefix', 'suffix')
+
+_CODE_PATTERN = r'^(?:(?P<pre>SH|SZ|BJ)(?P<pre_num>\d+)|(?P<suf_num>\d+)\.(?P<suf>SH|SZ|BJ|XSHG|XSHE|BJSE))$'
+
+# memoized code -> converted code, one table per target style; unrecognized codes map to NaN
+_tables: Dict[str, Dict[str, str]] = {style: {} for style in STYLES}
+
+
+def _convert(codes: pd.Index, style: str) -> pd.Series:
+    parts = pd.Series(codes, dtype=object).str.upper().str.extract(_CODE_PATTERN)
+    num = parts['pre_num'].fillna(parts['suf_num'])
+    tag = parts['pre'].fillna(parts['suf'])
+    if style == 'rq':
+        out = num + '.' + tag.map({k: v[1] for k, v in EXCHANGES.items()})
+    elif style == 'prefix':
+        out = tag.map({k: v[0] for k, v in EXCHANGES.items()}) + num
+    else:
+        out = num + '.' + tag.map({k: v[0] for k, v in EXCHANGES.items()})
+    return out
+
+
+def convert(codes: Iterable[str], style: str = 'rq') -> pd.Index:
+    """Convert security codes in any of SH600000 / 600000.SH / 600000.XSHG form to `style`.
+
+    'rq' gives 600000.XSHG, 'prefix' gives SH600000 and 'suffix' gives 600000.SH; codes that
+    are not recognized come back as NaN.
+    """
+    table = _tables[style]
+    codes = pd.Index(codes, dtype=object)
+    uniques = codes.unique()
+    missing = uniques[~uniques.isin(list(table))]
+    if len(missing):
+        table.update(zip(missing, _convert(missing, style)))
+    return codes.map(table)
+
+
+def to_rq(codes: Iterable[str]) -> pd.Index:
+    return convert(codes, 'rq')
+
+
+def rq_rename_map(codes: Iterable[str]) -> Dict[str, str]:
+    """{code: order_book_id} for the recognized codes, for DataFrame.rename(columns=...)."""
+    codes = pd.Index(codes, dtype=object)
+    return {code: rq_code for code, rq_code in zip(codes, to_rq(codes)) if pd.notna(rq_code)}
@@ -0,0 +1,167 @@
+import os
+import shutil
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def empty_panel() -> pd.DataFrame:
+    return pd.DataFrame(index=pd.DatetimeIndex([], name='datetime'), dtype=float)
+
+
+class MonthlyColumnStore:
+    """Month-partitioned columnar store of datetime x code panels.
+
+    Each month is a directory holding dates.npy, codes.npy and one <column>.npy date x code
+    matrix per column, so reads only touch the partitions, columns and rows they ask for.
+    row_columns maps the names of per-date values, e.g. a gen_time, to their dtype; each is one
+    <name>.npy vector alongside dates.npy. Cells of codes absent from some of a month's rows are
+    stored as `fill`. With packed=True the columns are 0/1 membership panels written one bit per
+    cell, as np.packbits rows in <column>.bits.npy, and read back as `dtype` 0/1; partitions written
+    unpacked still read.
+    """
+
+    def __init__(self, root: str, columns: List[str], dtype=np.float64, fill=np.nan,
+                 row_columns: Dict[str, np.dtype] = None, packed: bool = False):
+        self.root = root
+        self.columns = list(columns)
+        self.dtype = dtype
+        self.fill = fill
+        self.row_columns = dict(row_columns or {})
+        self.packed = packed
+        self._lock = threading.Lock()
+
+    def partitions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if len(name) == 6 and name.isdigit())
+
+    def read_partition(self, partition: str, columns: List[str], start_time: datetime = None,
+                       end_time: datetime = None, codes: pd.Index = None
+                       ) -> Tuple[pd.DatetimeIndex, np.ndarray, Dict[str, np.ndarray]]:
+        """Rows of one month within [start_time, end_time]; with `codes`, only the stored ones of those codes."""
+        path = os.path.join(self.root, partition)
+        dates = np.load(os.path.join(path, 'dates.npy'))
+        lo = 0 if start_time is None else np.searchsorted(dates, np.datetime64(start_time, 'ns'), 'left')
+        hi = len(dates) if end_time is None else np.searchsorted(dates, np.datetime64(end_time, 'ns'), 'right')
+        partition_codes = np.load(os.path.join(path, 'codes.npy'))
+        n_codes = len(partition_codes)
+        cols = None
+        if codes is not None:
+            cols = pd.Index(partition_codes).get_indexer(codes)
+            cols = cols[cols >= 0]
+            partition_codes = partition_codes[cols]
+        values = {}
+        for column in columns:
+            bits_path = os.path.join(path, column + '.bits.npy')
+            if column not in self.row_columns and os.path.exists(bits_path):
+                bits = np.load(bits_path, mmap_mode='r')[lo:hi]
+                array = np.unpackbits(bits, axis=1, count=n_codes).astype(self.dtype)
+            else:
+                array = np.load(os.path.join(path, column + '.npy'), mmap_mode='r')[lo:hi]
+            values[column] = array[:, cols] if cols is not None and column not in self.row_columns else array
+        return pd.DatetimeIndex(dates[lo:hi], name='datetime'), partition_codes, values
+
+    def write_partition(self, partition: str, frames: Dict[str, pd.DataFrame]):
+        path = os.path.join(self.root, partition)
+        # per-writer scratch names, so two writers of one partition never delete each other's directories
+        suffix = '.%d.%d' % (os.getpid(), threading.get_ident())
+        tmp = path + '.tmp' + suffix
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        any_frame = frames[self.columns[0]]
+        np.save(os.path.join(tmp, 'dates.npy'), any_frame.index.to_numpy(dtype='datetime64[ns]'))
+        np.save(os.path.join(tmp, 'codes.npy'), any_frame.columns.to_numpy(dtype=str))
+        for column in self.columns:
+            df = frames[column] if pd.isna(self.fill) else frames[column].fillna(self.fill)
+            if self.packed:
+                np.save(os.path.join(tmp, column + '.bits.npy'), np.packbits(df.to_numpy() != 0, axis=1))
+            else:
+                np.save(os.path.join(tmp, column + '.npy'), df.to_numpy(dtype=self.dtype))
+        for column, dtype in self.row_columns.items():
+            np.save(os.path.join(tmp, column + '.npy'), frames[column].to_numpy(dtype=dtype))
+        if os.path.exists(path):
+            os.replace(path, path + '.old' + suffix)
+        os.replace(tmp, path)
+        shutil.rmtree(path + '.old' + suffix, ignore_errors=True)
+
+    def upsert(self, frames: Dict[str, pd.DataFrame], drop_dates: Iterable[datetime] = ()):
+        """Replace the rows dated like `frames` (which share one index) and delete `drop_dates`.
+
+        frames holds a panel per column and a Series per row column; row columns left out are NaT/NaN.
+
+        Only the month partitions touched by those dates are rewritten. Upserts through one store
+        object are serialized, since each rewrites partitions it has just read.
+        """
+        with self._lock:
+            self._upsert(frames, drop_dates)
+
+    def _upsert(self, frames: Dict[str, pd.DataFrame], drop_dates: Iterable[datetime]):
+        new_index = frames[self.columns[0]].index if frames else pd.DatetimeIndex([])
+        drop_dates = pd.DatetimeIndex(list(drop_dates)).append(new_index)
+        new_partitions = new_index.strftime('%Y%m')
+
+        os.makedirs(self.root, exist_ok=True)
+        for partition in sorted(set(drop_dates.strftime('%Y%m'))):
+            merged = {}
+            if os.path.isdir(os.path.join(self.root, partition)):
+                dates, codes, values = self.read_partition(partition, self.columns + list(self.row_columns))
+                for column in self.columns:
+                    merged[column] = pd.DataFrame(values[column], index=dates, columns=codes).drop(
+                        index=drop_dates, errors='ignore')
+                for column in self.row_columns:
+                    merged[column] = pd.Series(values[column], index=dates).drop(index=drop_dates, errors='ignore')
+            mask = new_partitions == partition
+            for column in self.columns + list(self.row_columns):
+                if not mask.any():
+                    continue
+                if column in frames:
+                    new = frames[column].loc[mask]
+                else:
+                    new = pd.Series(np.full(mask.sum(), np.nan).astype(self.row_columns[column]), index=new_index[mask])
+                merged[column] = pd.concat([merged[column], new]).sort_index() if column in merged else new
+
+            panels = [merged[column] for column in self.columns if column in merged]
+            keep = np.any([df.notna().any().to_numpy() for df in panels], axis=0) if panels else None
+            if keep is None or not len(panels[0].index) or not keep.any():
+                shutil.rmtree(os.path.join(self.root, partition), ignore_errors=True)
+                continue
+            for column in self.columns:
+                df = merged[column].loc[:, keep]
+                merged[column] = df[sorted(df.columns)]
+            self.write_partition(partition, merged)
+
+    def read(self, columns: List[str], start_time: datetime, end_time: datetime) -> Dict[str, pd.DataFrame]:
+        """Read only `columns` and only the partitions and rows within [start_time, end_time]."""
+        partitions = self.partitions()
+        lo = bisect_left(partitions, start_time.strftime('%Y%m'))
+        hi = bisect_right(partitions, end_time.strftime('%Y%m'))
+
+        pieces = {column: [] for column in columns}
+        for partition in partitions[lo:hi]:
+            dates, codes, values = self.read_partition(partition, columns, start_time, end_time)
+            if not len(dates):
+                continue
+            for column in columns:
+                pieces[column].append(pd.DataFrame(values[column], index=dates, columns=codes))
+
+        panels = {}
+        for column in columns:
+            if not pieces[column]:
+                panels[column] = empty_panel()
+                continue
+            df = pd.concat(pieces[column])
+            df = df[sorted(df.columns)]
+            panels[column] = df.loc[:, df.notna().any()]
+        return panels
+
+    def last_date(self) -> Optional[pd.Timestamp]:
+        partitions = self.partitions()
+        if not partitions:
+            return None
+        dates, _, _ = self.read_partition(partitions[-1], [])
+        return dates[-1]
@@ -0,0 +1,82 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+READ_THREADS = min(8, os.cpu_count() or 1)
+# below this many bytes per thread the split is not worth it
+MIN_CHUNK_BYTES = 4 << 20
+
+
+def header_columns(header: bytes) -> List[str]:
+    """Column names of a CSV header line as pandas names them, e.g. 'Unnamed: 0' for an empty first name."""
+    return pd.read_csv(io.BytesIO(header), nrows=0).columns.to_list()
+
+
+def _split(body: bytes, n: int) -> List[bytes]:
+    """Cut body into at most n pieces on line boundaries."""
+    chunks = []
+    start = 0
+    for i in range(1, n):
+        cut = body.find(b'\n', max(start, len(body) * i // n))
+        if cut < 0:
+            break
+        chunks.append(body[start:cut + 1])
+        start = cut + 1
+    chunks.append(body[start:])
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _parse(header: bytes, body: bytes, index_column: str, usecols: List[str], dtype, threads: int) -> pd.DataFrame:
+    dtypes = {column: dtype for column in usecols if column != index_column}
+    dtypes[index_column] = str
+
+    def parse(chunk: bytes) -> pd.DataFrame:
+        return pd.read_csv(io.BytesIO(header + chunk), usecols=usecols, dtype=dtypes, engine='c')
+
+    n = max(1, min(threads, len(body) // MIN_CHUNK_BYTES))
+    chunks = _split(body, n)
+    if len(chunks) <= 1:
+        return parse(body)
+    # the C parser releases the GIL while tokenizing and converting, so chunks parse in parallel
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        return pd.concat(pool.map(parse, chunks), ignore_index=True)
+
+
+def read_wide_csv(source: Union[str, bytes], index_column: str, columns: List[str] = None, dtype=np.float32,
+                  parse_dates: bool = True, date_format: str = None, threads: int = READ_THREADS) -> pd.DataFrame:
+    """Read a CSV with one key column and many value columns, e.g. one column per stock.
+
+    source is a path or the file's bytes. Only `columns` (in that order, missing ones as NaN) are
+    parsed, all with `dtype`; index_column becomes the index, parsed as dates if parse_dates. Large
+    files are split on line boundaries and parsed on `threads` threads.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            data = f.read()
+    else:
+        data = source
+    cut = data.find(b'\n') + 1 or len(data)
+    header, body = data[:cut], data[cut:]
+
+    names = header_columns(header)
+    if columns is None:
+        usecols = names
+    else:
+        wanted = set(columns)
+        usecols = [index_column] + [column for column in names if column in wanted]
+    df = _parse(header, body, index_column, usecols, dtype, threads).set_index(index_column)
+    return _finish(df, columns, dtype, parse_dates, date_format)
+
+
+def _finish(df: pd.DataFrame, columns: Optional[List[str]], dtype, parse_dates: bool,
+            date_format: Optional[str]) -> pd.DataFrame:
+    if columns is not None and not df.columns.equals(pd.Index(columns)):
+        df = df.reindex(columns=columns).astype(dtype)
+    if parse_dates:
+        df.index = pd.to_datetime(df.index, format=date_format).rename(df.index.name)
+    return df
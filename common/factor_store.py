@@ -0,0 +1,162 @@
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from common import CACHE_ROOT, load_json, save_json
+from common.bitset import PoolBitset
+from common.columnar import MonthlyColumnStore
+
+
+FACTOR_STORE_DIR = os.environ.get('FACTOR_STORE_DIR', os.path.join(CACHE_ROOT, 'factors'))
+# typed_panel's dtype for POOL factors, the only 0/1 panels
+POOL_DTYPE = np.dtype(np.uint8)
+
+
+def _fill_value(dtype: np.dtype):
+    """Cell value for codes absent from a partition: NaN for floats, -1 for signed codes, 0 for pools."""
+    if dtype.kind == 'f':
+        return np.nan
+    if dtype.kind == 'i':
+        return -1
+    return 0
+
+
+def _json_attrs(attrs: dict) -> dict:
+    return {key: list(value) if isinstance(value, (tuple, pd.Index, np.ndarray)) else value
+            for key, value in attrs.items()}
+
+
+class FactorStore:
+    """Month-partitioned store of factor run() output, replacing the whole-history <Factor>.pkl files.
+
+    Each factor is a directory with meta.json (dtype and frame attrs) next to a MonthlyColumnStore
+    whose months hold dates.npy, gen_time.npy, codes.npy and a row-major date x code values.npy in
+    the factor's own dtype. Reads memory-map values.npy and slice rows by date and columns by code,
+    so a single cross-section only pages in one row of each month it touches. POOL factors (uint8)
+    are written bit-packed to values.bits.npy, one bit per cell, and read_pool() returns them as a
+    PoolBitset for universe algebra.
+    """
+
+    def __init__(self, root: str = FACTOR_STORE_DIR):
+        self.root = root
+        self._stores: Dict[str, MonthlyColumnStore] = {}
+        self._lock = threading.Lock()
+
+    def factors(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.exists(self._meta_path(name)))
+
+    def _meta_path(self, factor_name: str) -> str:
+        return os.path.join(self.root, factor_name, 'meta.json')
+
+    def meta(self, factor_name: str) -> Optional[dict]:
+        return load_json(self._meta_path(factor_name))
+
+    def _store(self, factor_name: str, dtype: np.dtype) -> MonthlyColumnStore:
+        with self._lock:
+            store = self._stores.get(factor_name)
+            if store is None or store.dtype != dtype:
+                store = MonthlyColumnStore(os.path.join(self.root, factor_name), ['values'], dtype,
+                                           fill=_fill_value(dtype), row_columns={'gen_time': 'datetime64[ns]'},
+                                           packed=dtype == POOL_DTYPE)
+                self._stores[factor_name] = store
+            return store
+
+    def partitions(self, factor_name: str) -> List[str]:
+        meta = self.meta(factor_name)
+        return [] if meta is None else self._store(factor_name, np.dtype(meta['dtype'])).partitions()
+
+    def _write_meta(self, factor_name: str, dtype: np.dtype, attrs: dict):
+        save_json(self._meta_path(factor_name), {'dtype': dtype.str, 'attrs': attrs})
+
+    def last_date(self, factor_name: str) -> Optional[pd.Timestamp]:
+        meta = self.meta(factor_name)
+        return None if meta is None else self._store(factor_name, np.dtype(meta['dtype'])).last_date()
+
+    def write(self, factor_name: str, df: pd.DataFrame, overwrite: bool = False):
+        """Persist a run() frame: a datetime index, an optional gen_time column and one column per code.
+
+        By default only rows after the last stored date are appended, so older months are never
+        rewritten; overwrite=True replaces the stored rows on the frame's dates instead. The dtype is
+        fixed by the first write and later frames are cast to it.
+        """
+        meta = self.meta(factor_name)
+        values = df.drop(columns=['gen_time'], errors='ignore')
+        if meta is None:
+            dtype = np.result_type(*values.dtypes) if len(values.columns) else np.dtype(np.float64)
+            if dtype == object:
+                dtype = np.dtype(np.float64)
+            self._write_meta(factor_name, dtype, _json_attrs(df.attrs))
+        else:
+            dtype = np.dtype(meta['dtype'])
+            if df.attrs:
+                self._write_meta(factor_name, dtype, _json_attrs(df.attrs))
+
+        index = pd.DatetimeIndex(df.index)
+        if not overwrite:
+            last = self.last_date(factor_name)
+            if last is not None:
+                keep = index > last
+                df, values, index = df.loc[keep], values.loc[keep], index[keep]
+        if not len(index):
+            return
+
+        gen_time = pd.Series(df['gen_time'].to_numpy(dtype='datetime64[ns]') if 'gen_time' in df.columns
+                             else np.full(len(index), np.datetime64('NaT', 'ns')), index=index)
+        values = values.set_axis(index)
+        if dtype.kind != 'f':
+            values = values.fillna(_fill_value(dtype))
+        self._store(factor_name, dtype).upsert({'values': values.astype(dtype), 'gen_time': gen_time})
+
+    def read(self, factor_name: str, start_time: datetime = None, end_time: datetime = None,
+             codes: Iterable[str] = None) -> pd.DataFrame:
+        """Read the stored frame, gen_time first, touching only the months, rows and codes asked for."""
+        meta = self.meta(factor_name)
+        if meta is None:
+            raise KeyError(factor_name)
+        dtype = np.dtype(meta['dtype'])
+        fill = _fill_value(dtype)
+        codes = None if codes is None else pd.Index(codes)
+
+        store = self._store(factor_name, dtype)
+        partitions = store.partitions()
+        lo = 0 if start_time is None else bisect_left(partitions, start_time.strftime('%Y%m'))
+        hi = len(partitions) if end_time is None else bisect_right(partitions, end_time.strftime('%Y%m'))
+
+        pieces = [store.read_partition(partition, ['values', 'gen_time'], start_time, end_time, codes)
+                  for partition in partitions[lo:hi]]
+        pieces = [piece for piece in pieces if len(piece[0])]
+
+        all_codes = codes if codes is not None else \
+            pd.Index(sorted(set().union(*(piece[1] for piece in pieces))))
+        n_rows = sum(len(piece[0]) for piece in pieces)
+        values = np.full((n_rows, len(all_codes)), fill, dtype=dtype)
+        row = 0
+        for dates, piece_codes, piece_values in pieces:
+            values[row:row + len(dates), all_codes.get_indexer(piece_codes)] = piece_values['values']
+            row += len(dates)
+
+        index = pd.DatetimeIndex(np.concatenate([piece[0] for piece in pieces]) if pieces else [], name='datetime')
+        df = pd.DataFrame(values, index=index, columns=all_codes)
+        gen_time = np.concatenate([piece[2]['gen_time'] for piece in pieces]) if pieces \
+            else np.array([], dtype='datetime64[ns]')
+        df.insert(0, 'gen_time', gen_time)
+        df.attrs.update(meta['attrs'])
+        return df
+
+    def read_pool(self, factor_name: str, start_time: datetime = None, end_time: datetime = None,
+                  codes: Iterable[str] = None) -> PoolBitset:
+        return PoolBitset.from_frame(self.read(factor_name, start_time, end_time, codes))
+
+    def cross_section(self, factor_name: str, dt: datetime, codes: Iterable[str] = None) -> pd.Series:
+        df = self.read(factor_name, dt, dt, codes)
+        return df.drop(columns=['gen_time']).iloc[0] if len(df) else pd.Series(dtype=float)
+
+
+factor_store = FactorStore()
@@ -0,0 +1,254 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common import CACHE_ROOT, load_pickle, save_pickle
+from common.session import rq
+from common.trading_calendar import trading_calendar
+
+
+INDUSTRY_DIR = os.path.join(CACHE_ROOT, 'industry')
+LEVEL_COLUMNS = {1: 'first_industry_name', 2: 'second_industry_name', 3: 'third_industry_name'}
+# trading days between probes when scanning history; reclassifications in between are found by bisection
+PROBE_STEP = 20
+
+# '' marks a stock without a classification on that day in the change table, -1 in code panels
+UNCLASSIFIED = ''
+UNCLASSIFIED_CODE = -1
+
+
+def _same(a: pd.Series, b: pd.Series) -> bool:
+    """Whether no stock classified on both days changed industry; listings and delistings are not changes."""
+    index = a.index.intersection(b.index)
+    return a.reindex(index).equals(b.reindex(index))
+
+
+def _normalize(changes: pd.DataFrame) -> pd.DataFrame:
+    changes = changes.drop_duplicates(['code', 'valid_from'], keep='last').sort_values(['code', 'valid_from'])
+    previous = changes.groupby('code')['industry'].shift()
+    return changes[changes['industry'].ne(previous)].reset_index(drop=True)
+
+
+def _categories(categories: List[str], changes: pd.DataFrame) -> List[str]:
+    known = set(categories)
+    return list(categories) + sorted(set(changes['industry']) - known - {UNCLASSIFIED})
+
+
+def decode(df: pd.DataFrame) -> pd.DataFrame:
+    """Map the integer columns of a code panel back to industry names via attrs['categories']."""
+    names = np.append(np.asarray(df.attrs['categories'], dtype=object), np.nan)
+    out = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_integer_dtype(df[column]):
+            out[column] = names[df[column].to_numpy()]
+    return out
+
+
+class IndustryHistory:
+    """Industry classification history kept as per-stock change points instead of one query per day.
+
+    The state is a table of (code, valid_from, industry) rows, one per reclassification, plus the
+    trading-day range it covers. Extending the range only queries rqdatac for the new days: every
+    PROBE_STEP-th day is probed and any window in which a stock classified at both ends changed
+    industry is bisected down to the day of the change. Stocks that appear or disappear between two
+    probes are dated from their listed_date / de_listed_date instead, falling back to the probe
+    where they were first (or no longer) seen.
+    """
+
+    def __init__(self, source: str = 'citics_2019', level: int = 1, root: str = INDUSTRY_DIR,
+                 probe_step: int = PROBE_STEP):
+        self.source = source
+        self.level = level
+        self.column = LEVEL_COLUMNS[level]
+        self.path = os.path.join(root, '%s_level%d.pkl' % (source, level))
+        self.probe_step = probe_step
+        self._snapshots: Dict[pd.Timestamp, pd.Series] = {}
+        self._listings: Optional[pd.DataFrame] = None
+
+    def _snapshot(self, day: pd.Timestamp, codes: List[str]) -> pd.Series:
+        if day not in self._snapshots:
+            df = rq.get_instrument_industry(order_book_ids=codes, date=day, level=self.level, source=self.source)
+            s = pd.Series(dtype=object) if df is None else df[self.column]
+            self._snapshots[day] = s.rename_axis('code')
+        return self._snapshots[day]
+
+    def _listing_dates(self) -> pd.DataFrame:
+        if self._listings is None:
+            df = rq.all_instruments(type="Stock").set_index('order_book_id')
+            # active stocks carry de_listed_date '0000-00-00', which becomes NaT
+            self._listings = pd.DataFrame({
+                column: pd.to_datetime(df[column], format='%Y-%m-%d', errors='coerce')
+                if column in df.columns else pd.NaT
+                for column in ['listed_date', 'de_listed_date']
+            }, index=df.index)
+        return self._listings
+
+    def _edges(self, days: pd.DatetimeIndex, lo: int, hi: int, s_lo: pd.Series,
+               s_hi: pd.Series) -> List[Tuple[pd.Timestamp, str, str]]:
+        """(valid_from, code, industry) rows for stocks entering or leaving between days[lo] and days[hi]."""
+        entered = s_hi.index.difference(s_lo.index)
+        left = s_lo.index.difference(s_hi.index)
+        if not len(entered) and not len(left):
+            return []
+        listings = self._listing_dates()
+        window = days[lo + 1:hi + 1]
+
+        def first_day(dates: pd.Series, after: bool) -> pd.DatetimeIndex:
+            # first window day on (listing) or after (delisting) the event; days[hi], where the change was
+            # seen, if the event is unknown or does not fall inside the window
+            values = dates.to_numpy()
+            positions = window.searchsorted(values, 'right' if after else 'left')
+            inside = dates.notna().to_numpy() & (values >= days[lo] if after else values > days[lo]) \
+                & (positions < len(window))
+            return window[np.where(inside, positions, len(window) - 1)]
+
+        listed = listings['listed_date'].reindex(entered)
+        delisted = listings['de_listed_date'].reindex(left)
+        edges = list(zip(first_day(listed, False), entered, s_hi.reindex(entered)))
+        edges += [(day, code, UNCLASSIFIED) for day, code in zip(first_day(delisted, True), left)]
+        return edges
+
+    def _scan(self, days: pd.DatetimeIndex, codes: List[str], known: Dict[int, pd.Series] = None
+              ) -> Tuple[List[Tuple[pd.Timestamp, pd.Series]], List[Tuple[pd.Timestamp, str, str]]]:
+        """Snapshots at days[0] and at every day of `days` on which a classified stock changed industry,
+        plus the (valid_from, code, industry) rows of stocks entering or leaving the classification."""
+        known = {} if known is None else known
+
+        def snapshot(i: int) -> pd.Series:
+            return known[i] if i in known else self._snapshot(days[i], codes)
+
+        points = {0: snapshot(0)}
+
+        def bisect(lo: int, hi: int, s_lo: pd.Series, s_hi: pd.Series):
+            if _same(s_lo, s_hi):
+                return
+            if hi - lo == 1:
+                points[hi] = s_hi
+                return
+            mid = (lo + hi) // 2
+            s_mid = snapshot(mid)
+            bisect(lo, mid, s_lo, s_mid)
+            bisect(mid, hi, s_mid, s_hi)
+
+        probes = list(range(0, len(days), self.probe_step))
+        if probes[-1] != len(days) - 1:
+            probes.append(len(days) - 1)
+        edges = []
+        previous = points[0]
+        for lo, hi in zip(probes, probes[1:]):
+            s_hi = snapshot(hi)
+            bisect(lo, hi, previous, s_hi)
+            edges += self._edges(days, lo, hi, previous, s_hi)
+            previous = s_hi
+        return [(days[i], points[i]) for i in sorted(points)], edges
+
+    @staticmethod
+    def _to_changes(points: List[Tuple[pd.Timestamp, pd.Series]],
+                    edges: List[Tuple[pd.Timestamp, str, str]] = ()) -> pd.DataFrame:
+        frame = pd.DataFrame({day: s for day, s in points}).T
+        # a stock missing from a point is only a change where the edges say so, not a reclassification
+        frame = frame.ffill().fillna(UNCLASSIFIED)
+        changed = frame.ne(frame.shift())
+        changed.iloc[0] = True
+        changes = frame.stack()[changed.stack()]
+        changes.index.names = ['valid_from', 'code']
+        changes = changes.rename('industry').reset_index()[['code', 'valid_from', 'industry']]
+        edges = pd.DataFrame(list(edges), columns=['valid_from', 'code', 'industry'])
+        return _normalize(pd.concat([changes, edges[['code', 'valid_from', 'industry']]]))
+
+    @staticmethod
+    def _snapshot_at(changes: pd.DataFrame, day: pd.Timestamp) -> pd.Series:
+        in_force = changes[changes['valid_from'] <= day].sort_values('valid_from').groupby('code')['industry'].last()
+        return in_force[in_force != UNCLASSIFIED].rename(None)
+
+    def _load(self) -> Optional[dict]:
+        return load_pickle(self.path)
+
+    def _save(self, state: dict):
+        save_pickle(self.path, state)
+
+    def update(self, start_time: datetime, end_time: datetime, codes: List[str]) -> Optional[dict]:
+        """Extend the stored history to cover the trading days in [start_time, end_time]."""
+        days = trading_calendar.trading_dates(start_time, end_time)
+        state = self._load()
+        if not len(days):
+            return state
+
+        if state is None:
+            changes = self._to_changes(*self._scan(days, codes))
+            state = {'changes': changes, 'start': days[0], 'end': days[-1], 'categories': _categories([], changes)}
+            self._save(state)
+            return state
+
+        changes = state['changes']
+        dirty = False
+        if days[0] < state['start']:
+            head = trading_calendar.trading_dates(days[0], state['start'])
+            known = {len(head) - 1: self._snapshot_at(changes, state['start'])}
+            changes = _normalize(pd.concat([self._to_changes(*self._scan(head, codes, known)), changes]))
+            state['start'] = days[0]
+            dirty = True
+        if days[-1] > state['end']:
+            tail = trading_calendar.trading_dates(state['end'], days[-1])
+            known = {0: self._snapshot_at(changes, state['end'])}
+            changes = _normalize(pd.concat([changes, self._to_changes(*self._scan(tail, codes, known))]))
+            state['end'] = days[-1]
+            dirty = True
+
+        categories = _categories(state.get('categories', []), changes)
+        if dirty or categories != state.get('categories'):
+            state['changes'] = changes
+            state['categories'] = categories
+            self._save(state)
+        return state
+
+    def intervals(self) -> pd.DataFrame:
+        """(code, industry, valid_from, valid_to) table; valid_to of an open interval is the last covered day."""
+        state = self._load()
+        if state is None:
+            return pd.DataFrame(columns=['code', 'industry', 'valid_from', 'valid_to'])
+        changes = state['changes']
+        next_from = changes.groupby('code')['valid_from'].shift(-1)
+        valid_to = trading_calendar.dates[trading_calendar.dates.searchsorted(next_from.dropna(), 'left') - 1]
+        df = changes.assign(valid_to=state['end'])
+        df.loc[next_from.notna(), 'valid_to'] = valid_to
+        df = df[df['industry'] != UNCLASSIFIED]
+        return df[['code', 'industry', 'valid_from', 'valid_to']].reset_index(drop=True)
+
+    def code_panel(self, start_time: datetime, end_time: datetime, codes: List[str]) -> pd.DataFrame:
+        """Daily trading-day x code panel of industry codes over `codes`.
+
+        Cells index into the history's category dictionary, stored in attrs['categories'] and
+        only ever appended to, so codes stay comparable across runs; UNCLASSIFIED_CODE marks
+        stocks without an industry. Use decode() to get names back.
+        """
+        state = self.update(start_time, end_time, codes)
+        days = trading_calendar.trading_dates(start_time, end_time)
+        categories = [] if state is None else state['categories']
+        dtype = np.int8 if len(categories) < np.iinfo(np.int8).max else np.int16
+
+        matrix = np.full((len(days), len(codes)), UNCLASSIFIED_CODE, dtype=dtype)
+        if state is not None and len(days):
+            changes = state['changes']
+            changes = changes[changes['valid_from'] <= days[-1]]
+            rows = np.clip(days.searchsorted(changes['valid_from'], 'right') - 1, 0, None)
+            cols = pd.Index(codes).get_indexer(changes['code'])
+            values = pd.Index(categories).get_indexer(changes['industry'])
+            events = pd.DataFrame({'row': rows, 'col': cols, 'value': values})
+            # changes are sorted by valid_from within a code, so the last event landing on a row is the one in force
+            events = events[events['col'] >= 0].drop_duplicates(['row', 'col'], keep='last')
+
+            filled = np.full(matrix.shape, np.nan)
+            filled[events['row'].to_numpy(), events['col'].to_numpy()] = events['value'].to_numpy()
+            matrix[:] = pd.DataFrame(filled).ffill().fillna(UNCLASSIFIED_CODE).to_numpy()
+
+        df = pd.DataFrame(matrix, index=days.rename('datetime'), columns=codes)
+        df.attrs['categories'] = list(categories)
+        return df
+
+    def panel(self, start_time: datetime, end_time: datetime, codes: List[str]) -> pd.DataFrame:
+        """Daily trading-day x code panel of industry names over `codes`."""
+        return decode(self.code_panel(start_time, end_time, codes))
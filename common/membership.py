@@ -0,0 +1,162 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common import CACHE_ROOT, load_pickle, save_pickle
+from common.session import rq
+from common.trading_calendar import trading_calendar
+
+
+INDEX_DIR = os.path.join(CACHE_ROOT, 'index')
+
+
+def membership_matrix(components: Dict[datetime, List[str]]) -> pd.DataFrame:
+    """datetime x code uint8 matrix of an rq.index_components {date: [codes]} dict, 1 for members."""
+    dates = sorted(components or {})
+    lengths = [len(components[dt]) for dt in dates]
+    if not sum(lengths):
+        return pd.DataFrame(index=pd.DatetimeIndex(dates, name='datetime'), dtype=np.uint8)
+
+    flat = np.concatenate([np.asarray(components[dt], dtype=object) for dt in dates])
+    codes, cols = np.unique(flat, return_inverse=True)
+    rows = np.repeat(np.arange(len(dates)), lengths)
+
+    matrix = np.zeros((len(dates), len(codes)), dtype=np.uint8)
+    matrix[rows, cols] = 1
+    return pd.DataFrame(matrix, index=pd.DatetimeIndex(dates, name='datetime'), columns=codes.tolist())
+
+
+def _intervals(df: pd.DataFrame) -> pd.DataFrame:
+    """(code, in_date, out_date) runs of consecutive member days in a membership matrix; out_date is the last member day."""
+    m = df.to_numpy(dtype=bool).T
+    zeros = np.zeros((m.shape[0], 1), dtype=bool)
+    enters = m & ~np.hstack([zeros, m[:, :-1]])
+    leaves = m & ~np.hstack([m[:, 1:], zeros])
+    # nonzero walks row-major, i.e. code by code in date order, so the k-th enter pairs with the k-th leave
+    code_idx, in_idx = np.nonzero(enters)
+    _, out_idx = np.nonzero(leaves)
+    return pd.DataFrame({'code': df.columns.to_numpy()[code_idx],
+                         'in_date': df.index[in_idx],
+                         'out_date': df.index[out_idx]})
+
+
+def _merge(intervals: pd.DataFrame) -> pd.DataFrame:
+    """Join intervals of the same code that touch on consecutive trading days."""
+    intervals = intervals.sort_values(['code', 'in_date']).reset_index(drop=True)
+    dates = trading_calendar.dates
+    in_pos = dates.searchsorted(intervals['in_date'])
+    out_pos = dates.searchsorted(intervals['out_date'])
+    same_code = intervals['code'].eq(intervals['code'].shift()).to_numpy()
+    touches = np.r_[False, in_pos[1:] <= out_pos[:-1] + 1] & same_code
+    group = np.cumsum(~touches)
+    merged = intervals.groupby(group).agg(code=('code', 'first'), in_date=('in_date', 'min'), out_date=('out_date', 'max'))
+    return merged.reset_index(drop=True)
+
+
+class IndexConstituents:
+    """Index membership kept as an interval table (code, in_date, out_date) instead of a dense daily matrix.
+
+    Only dates outside the range already covered are requested from rq.index_components, so storage and
+    refresh cost follow the number of rebalances. The covered range only spans dates the vendor actually
+    returned, so a day not yet published is asked for again on the next run rather than stored as empty.
+    Daily matrices and as-of member lists are expanded on demand.
+    """
+
+    def __init__(self, index_code: str, root: str = INDEX_DIR):
+        self.index_code = index_code
+        self.path = os.path.join(root, index_code + '.pkl')
+
+    def _load(self) -> Optional[dict]:
+        return load_pickle(self.path)
+
+    def _save(self, state: dict):
+        save_pickle(self.path, state)
+
+    def _fetch(self, start: pd.Timestamp, end: pd.Timestamp) -> Tuple[pd.DataFrame, pd.DatetimeIndex]:
+        """Intervals over [start, end] and the dates rq.index_components returned for it."""
+        components = rq.index_components(self.index_code, start_date=start, end_date=end)
+        df = membership_matrix(components)
+        return _intervals(df), df.index.normalize()
+
+    def update(self, start_time: datetime, end_time: datetime) -> Optional[dict]:
+        days = trading_calendar.trading_dates(start_time, end_time)
+        state = self._load()
+        if not len(days):
+            return state
+
+        if state is None:
+            intervals, returned = self._fetch(days[0], days[-1])
+            if not len(returned):
+                return None
+            state = {'intervals': intervals, 'start': returned[0], 'end': returned[-1]}
+            self._save(state)
+            return state
+
+        pieces = [state['intervals']]
+        if days[0] < state['start']:
+            intervals, returned = self._fetch(days[0], trading_calendar.prev_trading_day(state['start']))
+            if len(returned):
+                pieces.append(intervals)
+                state['start'] = returned[0]
+        if days[-1] > state['end']:
+            intervals, returned = self._fetch(trading_calendar.next_trading_day(state['end']), days[-1])
+            if len(returned):
+                pieces.append(intervals)
+                state['end'] = returned[-1]
+        if len(pieces) > 1:
+            state['intervals'] = _merge(pd.concat(pieces))
+            self._save(state)
+        return state
+
+    @staticmethod
+    def _overlapping(state: dict, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+        df = state['intervals']
+        return df[(df['in_date'] <= pd.Timestamp(end_time)) & (df['out_date'] >= pd.Timestamp(start_time).normalize())]
+
+    def intervals(self, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+        state = self.update(start_time, end_time)
+        if state is None:
+            return pd.DataFrame(columns=['code', 'in_date', 'out_date'])
+        return self._overlapping(state, start_time, end_time)
+
+    def members(self, dt: datetime) -> List[str]:
+        """Constituents as of trading day dt."""
+        day = pd.Timestamp(dt).normalize()
+        df = self.intervals(day, day)
+        return sorted(df['code'])
+
+    def matrix(self, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+        """Trading-day x code uint8 membership matrix over the codes that were members at some point in the range.
+
+        Rows only cover the days the stored components cover, so unpublished days are left out rather than empty.
+        """
+        state = self.update(start_time, end_time)
+        if state is None:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name='datetime'), dtype=np.uint8)
+        days = trading_calendar.trading_dates(start_time, end_time)
+        days = days[(days >= state['start']) & (days <= state['end'])]
+        df = self._overlapping(state, start_time, end_time)
+        codes = pd.Index(sorted(set(df['code'])))
+        if not len(days) or not len(codes):
+            return pd.DataFrame(index=days.rename('datetime'), columns=codes, dtype=np.uint8)
+
+        # +1 on the first member day, -1 on the day after the last, then a running sum down the dates
+        lo = days.searchsorted(df['in_date'], 'left')
+        hi = days.searchsorted(df['out_date'], 'right')
+        cols = codes.get_indexer(df['code'])
+        steps = np.zeros((len(days) + 1, len(codes)), dtype=np.int16)
+        np.add.at(steps, (lo, cols), 1)
+        np.add.at(steps, (hi, cols), -1)
+        matrix = np.cumsum(steps[:-1], axis=0).astype(np.uint8)
+        return pd.DataFrame(matrix, index=days.rename('datetime'), columns=codes.to_list())
+
+
+def index_memberships(index_codes: List[str], start_time: datetime, end_time: datetime) -> Dict[str, pd.DataFrame]:
+    return {index_code: IndexConstituents(index_code).matrix(start_time, end_time) for index_code in index_codes}
+
+
+def index_membership(index_code: str, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+    return index_memberships([index_code], start_time, end_time)[index_code]
@@ -0,0 +1,56 @@
+from datetime import timedelta
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+from factorbase.factor import FactorType
+
+
+# value dtype of each factor type's panel; INDUSTRY panels keep their own integer width
+PANEL_DTYPES = {
+    FactorType.NORMAL: np.float64,
+    FactorType.RISK: np.float64,
+    FactorType.POOL: np.uint8,
+    FactorType.INDUSTRY: np.int16,
+}
+
+
+def price_panel(df_px: pd.DataFrame, field: str, codes: List[str]) -> pd.DataFrame:
+    """Pivot a long (order_book_id, date) rq.get_price result into a datetime x code float64 panel.
+
+    The code axis is exactly `codes`, in order; codes without any bar come out as all-NaN columns.
+    """
+    df = df_px[field].unstack(level=0).reindex(columns=codes).astype(np.float64)
+    df.index.name = 'datetime'
+    df.columns.name = None
+    return df
+
+
+def typed_panel(df: pd.DataFrame, factor_type: FactorType,
+                gen_time: Union[timedelta, pd.Series, pd.DatetimeIndex, np.ndarray] = timedelta(0),
+                dtype=None) -> pd.DataFrame:
+    """A run() frame: a datetime64 gen_time column followed by one column per code in factor_type's dtype.
+
+    gen_time is either an offset added to the index or one timestamp per row. POOL cells become
+    1 for any non-zero value and 0 for zero or NaN. dtype overrides PANEL_DTYPES, e.g. float32.
+    """
+    values = df.drop(columns=['gen_time'], errors='ignore')
+    index = pd.DatetimeIndex(values.index, name='datetime')
+    if dtype is None:
+        dtype = PANEL_DTYPES[factor_type]
+        if factor_type == FactorType.INDUSTRY and all(t.kind == 'i' for t in values.dtypes):
+            dtype = np.result_type(*values.dtypes) if len(values.columns) else dtype
+
+    if factor_type == FactorType.POOL:
+        matrix = (values.fillna(0).to_numpy() != 0).astype(dtype)
+    else:
+        matrix = values.to_numpy(dtype=dtype)
+
+    if isinstance(gen_time, timedelta):
+        gen_time = index + gen_time
+    out = pd.DataFrame(matrix, index=index, columns=values.columns)
+    out.columns.name = None
+    out.insert(0, 'gen_time', np.asarray(gen_time, dtype='datetime64[ns]'))
+    out.attrs.update(df.attrs)
+    return out
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import List
+
+import pandas as pd
+
+from common import CACHE_ROOT, load_json, save_json
+from common.columnar import MonthlyColumnStore
+from common.panel import price_panel
+from common.rqfetch import price_waves
+
+
+PRICE_DIR = os.path.join(CACHE_ROOT, 'prices')
+PRICE_FIELDS = ['open', 'close']
+
+# every top-up re-fetches this many calendar days before the last covered date to pick up vendor revisions
+REVISION_DAYS = 7
+# ... but at most once per this many seconds, so factors sharing a process don't each redo it
+REFRESH_SECONDS = 600
+
+
+class PriceStore:
+    """Append-only local store of unadjusted daily bars, one MonthlyColumnStore column per field.
+
+    meta.json records the date range already fetched from rqdatac, so a run only downloads the
+    dates past that range (plus REVISION_DAYS) and reads everything else from disk. Downloads are
+    written to the store one date window at a time, so a full backfill never holds the whole
+    history in memory. Top-ups and reads are serialized, so factors sharing the process never
+    fetch or rewrite the same months at once, nor read a month while it is being swapped.
+    """
+
+    def __init__(self, root: str = PRICE_DIR, fields: List[str] = PRICE_FIELDS):
+        self.root = root
+        self.fields = list(fields)
+        self.meta_path = os.path.join(root, 'meta.json')
+        self.store = MonthlyColumnStore(root, self.fields)
+        self._lock = threading.Lock()
+
+    def _load_meta(self) -> dict:
+        return load_json(self.meta_path, {})
+
+    def _save_meta(self, meta: dict):
+        save_json(self.meta_path, meta)
+
+    def _fetch(self, codes: List[str], start: date, end: date):
+        for df_px in price_waves(codes,
+                                 start_date=start.strftime('%Y-%m-%d'),
+                                 end_date=end.strftime('%Y-%m-%d'),
+                                 frequency='1d',
+                                 adjust_type='none',
+                                 fields=self.fields):
+            self.store.upsert({field: price_panel(df_px, field, codes) for field in self.fields})
+
+    def top_up(self, codes: List[str], start_time: datetime, end_time: datetime):
+        with self._lock:
+            self._top_up(codes, start_time, end_time)
+
+    def _top_up(self, codes: List[str], start_time: datetime, end_time: datetime):
+        start = start_time.date()
+        end = end_time.date()
+        meta = self._load_meta()
+
+        if not meta:
+            self._fetch(codes, start, end)
+            self._save_meta({'start': start.isoformat(), 'end': end.isoformat(), 'updated_at': time.time()})
+            return
+
+        covered_start = date.fromisoformat(meta['start'])
+        covered_end = date.fromisoformat(meta['end'])
+        revision_start = covered_end - timedelta(days=REVISION_DAYS)
+
+        if start < covered_start:
+            self._fetch(codes, start, covered_start - timedelta(days=1))
+            meta['start'] = start.isoformat()
+
+        refresh_due = time.time() - meta.get('updated_at', 0) > REFRESH_SECONDS
+        if end > covered_end or (end >= revision_start and refresh_due):
+            self._fetch(codes, revision_start, max(end, covered_end))
+            meta['end'] = max(end, covered_end).isoformat()
+            meta['updated_at'] = time.time()
+
+        self._save_meta(meta)
+
+    def panel(self, field: str, start_time: datetime, end_time: datetime, codes: List[str]) -> pd.DataFrame:
+        with self._lock:
+            self._top_up(codes, start_time, end_time)
+            return self.store.read([field], start_time, end_time)[field].reindex(columns=codes)
+
+
+price_store = PriceStore()
+
+
+def price_history(field: str, start_time: datetime, end_time: datetime, codes: List[str]) -> pd.DataFrame:
+    return price_store.panel(field, start_time, end_time, codes)
@@ -0,0 +1,129 @@
+import ast
+import glob
+import importlib
+import os
+import sys
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Factor methods whose single `return` is read statically; enum members are kept by name, e.g. 'POOL'
+METADATA_METHODS = [
+    'factor_name',
+    'factor_type',
+    'frequency',
+    'security_type',
+    'trigger_time',
+    'first_start_time',
+    'author',
+    'desc',
+]
+
+
+class FactorSpec(NamedTuple):
+    """Static metadata of one factor, read from its source without importing the module."""
+    module: str
+    class_name: str
+    path: str
+    factor_name: Optional[str]
+    factor_type: Optional[str]
+    frequency: Optional[str]
+    security_type: Optional[str]
+    trigger_time: Optional[str]
+    first_start_time: Optional[datetime]
+    author: Optional[str]
+    desc: Optional[str]
+
+    def load(self) -> type:
+        """Import the factor module and return its class."""
+        directory = os.path.dirname(self.path)
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+        return getattr(importlib.import_module(self.module), self.class_name)
+
+    def create(self):
+        return self.load()()
+
+
+def _literal(node: ast.expr):
+    if isinstance(node, ast.Constant):
+        return node.value
+    # FactorType.POOL, Frequency.DAILY, ...
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+        return node.attr
+    # datetime(2010, 1, 1)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'datetime' \
+            and not node.keywords and all(isinstance(arg, ast.Constant) for arg in node.args):
+        return datetime(*(arg.value for arg in node.args))
+    return None
+
+
+def _returned(func: ast.FunctionDef):
+    returns = [node for node in func.body if isinstance(node, ast.Return)]
+    if len(returns) != 1 or returns[0].value is None:
+        return None
+    return _literal(returns[0].value)
+
+
+def parse_factor_file(path: str) -> Optional[FactorSpec]:
+    """FactorSpec of the `class <Module>(Factor)` defined in path, or None if there is none."""
+    module = os.path.basename(path)[:-3]
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == module \
+                and any(isinstance(base, ast.Name) and base.id == 'Factor' for base in node.bases):
+            methods = {item.name: item for item in node.body if isinstance(item, ast.FunctionDef)}
+            metadata = {name: _returned(methods[name]) if name in methods else None for name in METADATA_METHODS}
+            return FactorSpec(module, node.name, path, **metadata)
+    return None
+
+
+class FactorRegistry:
+    """The factors defined at the top level of the repo, keyed by module name.
+
+    Metadata comes from parsing the sources, so listing factors or their trigger times imports
+    neither pandas nor rqdatac; a module is only imported by FactorSpec.load() when it runs.
+    """
+
+    def __init__(self, repo_dir: str = REPO_DIR):
+        self.repo_dir = repo_dir
+        self._specs: Optional[Dict[str, FactorSpec]] = None
+
+    @property
+    def specs(self) -> Dict[str, FactorSpec]:
+        if self._specs is None:
+            specs = {}
+            for path in sorted(glob.glob(os.path.join(self.repo_dir, '*.py'))):
+                spec = parse_factor_file(path)
+                if spec is not None:
+                    specs[spec.module] = spec
+            self._specs = specs
+        return self._specs
+
+    def __getitem__(self, name: str) -> FactorSpec:
+        return self.specs[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
+
+    def __iter__(self):
+        return iter(self.specs)
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def where(self, **metadata) -> Dict[str, FactorSpec]:
+        """Factors whose metadata equals every given value, e.g. where(factor_type='POOL')."""
+        return {name: spec for name, spec in self.specs.items()
+                if all(getattr(spec, key) == value for key, value in metadata.items())}
+
+
+registry = FactorRegistry()
+
+
+if __name__ == '__main__':
+    for name, spec in registry.specs.items():
+        print(name, spec.factor_type, spec.frequency, spec.security_type, repr(spec.trigger_time), spec.first_start_time)
@@ -0,0 +1,143 @@
+import hashlib
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from common import CACHE_ROOT, load_json, save_json
+from common.columnar import MonthlyColumnStore, empty_panel
+from common.csv_reader import header_columns, read_wide_csv
+
+
+RESULTS_DIR = os.path.join(CACHE_ROOT, 'results')
+
+# trailing rows re-read on every ingest, so revisions to the latest days are picked up
+REVISION_ROWS = 5
+# read size when hashing the rows before the re-read window
+HASH_CHUNK_BYTES = 4 << 20
+
+
+def _line_starts(body: bytes) -> List[int]:
+    """Offsets in body of every non-empty line."""
+    starts = np.flatnonzero(np.frombuffer(body, dtype=np.uint8) == ord('\n')) + 1
+    starts = [0] + starts.tolist()
+    return [start for start, end in zip(starts, starts[1:] + [len(body)]) if body[start:end].strip()]
+
+
+class ResultFileStore:
+    """Date x code rows of a results directory whose daily CSV is a full-history snapshot.
+
+    Rows are kept as float32, the dtype they are parsed in, in a MonthlyColumnStore under
+    RESULTS_DIR/<name>. state.json remembers the last ingested file, its header, the byte offset
+    where its last REVISION_ROWS rows start and a hash of every row before that offset. A new
+    snapshot whose header and prefix hash match is ingested by parsing only from that offset, so a
+    daily run parses a few rows rather than the whole history; a revision anywhere in the older
+    rows, or rows out of date order, falls back to a full read.
+
+    rename maps the CSV header to stock codes and the date column to 'datetime'.
+    """
+
+    def __init__(self, name: str, rename: Callable[[List[str]], Dict[str, str]], root: str = RESULTS_DIR):
+        self.root = os.path.join(root, name)
+        self.rename = rename
+        self.state_path = os.path.join(self.root, 'state.json')
+        self.store = MonthlyColumnStore(self.root, ['value'], dtype=np.float32)
+
+    def _load_state(self) -> Optional[dict]:
+        return load_json(self.state_path)
+
+    def _save_state(self, state: dict):
+        save_json(self.state_path, state)
+
+    def _parse(self, header: bytes, body: bytes) -> pd.DataFrame:
+        new_columns = self.rename(header_columns(header))
+        date_column = next(column for column, new in new_columns.items() if new == 'datetime')
+        codes = [column for column, new in new_columns.items() if new != 'datetime']
+        df = read_wide_csv(header + body, date_column, codes, dtype=np.float32)
+        return df.rename(columns=new_columns)
+
+    def _stored_dates(self, start_time: datetime = None) -> pd.DatetimeIndex:
+        partitions = self.store.partitions()
+        if start_time is not None:
+            partitions = [p for p in partitions if p >= start_time.strftime('%Y%m')]
+        dates = [self.store.read_partition(p, [], start_time)[0] for p in partitions]
+        return dates[0].append(dates[1:]) if dates else pd.DatetimeIndex([])
+
+    @staticmethod
+    def _prefix(f, rows_start: int, offset: int):
+        """sha1 of the bytes in [rows_start, offset), i.e. the rows before the re-read window."""
+        prefix = hashlib.sha1()
+        f.seek(rows_start)
+        remaining = offset - rows_start
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            prefix.update(chunk)
+            remaining -= len(chunk)
+        return prefix
+
+    def ingest(self, path: str):
+        """Bring the store in line with the snapshot at path, reading only its new tail when possible."""
+        st = os.stat(path)
+        key = [os.path.basename(path), st.st_size, st.st_mtime]
+        state = self._load_state()
+        if state is not None and state['file'] == key:
+            return
+
+        with open(path, 'rb') as f:
+            header = f.readline()
+            delta = state is not None and state['header'] == header.decode() and st.st_size >= state['offset'] \
+                and state.get('prefix') is not None
+            if delta:
+                prefix = self._prefix(f, len(header), state['offset'])
+                delta = prefix.hexdigest() == state['prefix']
+            if not delta:
+                prefix = hashlib.sha1()
+            body_start = state['offset'] if delta else len(header)
+            f.seek(body_start)
+            body = f.read()
+
+        rows = self._parse(header, body)
+        ordered = rows.index.is_monotonic_increasing
+        if delta and not ordered:
+            state['prefix'] = None
+            self._save_state(state)
+            return self.ingest(path)
+
+        df = rows[~rows.index.duplicated(keep='last')].sort_index()
+        stale = self._stored_dates(pd.Timestamp(state['window_start']) if delta else None)
+        self.store.upsert({'value': df}, stale.difference(df.index))
+
+        starts = _line_starts(body)
+        if len(starts) != len(rows) or not len(rows):
+            # the tail cannot be located line by line, so the next snapshot is read in full
+            ordered = False
+            starts = [0]
+        window = max(0, len(starts) - REVISION_ROWS)
+        # the rows already hashed, extended by the parsed ones that now fall before the window
+        prefix.update(body[:starts[window]])
+
+        self._save_state({
+            'file': key,
+            'header': header.decode(),
+            'offset': body_start + starts[window],
+            'prefix': prefix.hexdigest() if ordered else None,
+            'window_start': rows.index[window].isoformat() if ordered else None,
+        })
+
+    def frame(self, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+        """Stored rows dated in [start_time, end_time], led by the last row before start_time to fill from."""
+        partitions = [p for p in self.store.partitions() if p <= start_time.strftime('%Y%m')]
+        first = None
+        for partition in reversed(partitions):
+            dates = self.store.read_partition(partition, [], None, start_time)[0]
+            if len(dates):
+                first = dates[-1]
+                break
+        if first is None:
+            first = start_time
+        df = self.store.read(['value'], first, end_time)['value']
+        return df if len(df.columns) else empty_panel()
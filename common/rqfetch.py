@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from common.session import rq
+
+
+# fields always fetched on top of the requested ones; empty now that the unadjusted bars come from the price
+# store and the pre-adjusted downloads only ever need open
+DEFAULT_FIELDS: List[str] = []
+
+PriceKey = Tuple[Tuple[str, ...], str, str, str, str]
+
+# large downloads are split into code-batch x date-window chunks run on a bounded thread pool
+FETCH_WORKERS = 4
+CODE_BATCH = 500
+WINDOW_DAYS = 366
+MIN_WINDOW_DAYS = 7
+MAX_WINDOW_DAYS = 3660
+# the window is resized after every wave of chunks towards these per-chunk targets
+TARGET_CHUNK_SECONDS = 10.0
+MAX_CHUNK_ROWS = 500000
+RETRIES = 3
+RETRY_BACKOFF_SECONDS = 1.0
+
+
+class ChunkedFetcher:
+    """rq.get_price split into code-batch x date-window chunks.
+
+    Each date window is fetched as one wave of code batches on a thread pool of `workers`; the
+    window length is then rescaled from the slowest chunk's latency and row count, so later waves
+    aim at TARGET_CHUNK_SECONDS and MAX_CHUNK_ROWS. A failing chunk is retried on its own, with
+    backoff, instead of restarting the whole download.
+
+    waves() yields each window's bars as soon as the window is complete, with the next window
+    already downloading, so a consumer that writes them away holds at most two windows in memory;
+    fetch() concatenates them.
+    """
+
+    def __init__(self, workers: int = FETCH_WORKERS, code_batch: int = CODE_BATCH, window_days: int = WINDOW_DAYS,
+                 retries: int = RETRIES):
+        self.workers = workers
+        self.code_batch = code_batch
+        self.window_days = window_days
+        self.retries = retries
+
+    def _get(self, codes: List[str], start: pd.Timestamp, end: pd.Timestamp, frequency: str, adjust_type: str,
+             fields: List[str]) -> Tuple[Optional[pd.DataFrame], float]:
+        for attempt in range(self.retries + 1):
+            try:
+                started = time.monotonic()
+                df = rq.get_price(codes,
+                                  start_date=start.strftime('%Y-%m-%d'),
+                                  end_date=end.strftime('%Y-%m-%d'),
+                                  frequency=frequency,
+                                  adjust_type=adjust_type,
+                                  fields=fields)
+                return df, time.monotonic() - started
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+    def _adapt(self, stats: List[Tuple[float, int]]):
+        seconds = max(s for s, _ in stats)
+        rows = max(r for _, r in stats)
+        scale = TARGET_CHUNK_SECONDS / max(seconds, 1e-3)
+        if rows:
+            scale = min(scale, MAX_CHUNK_ROWS / rows)
+        scale = min(max(scale, 0.5), 2.0)
+        self.window_days = int(min(max(self.window_days * scale, MIN_WINDOW_DAYS), MAX_WINDOW_DAYS))
+
+    def waves(self, codes: List[str], start_date: str, end_date: str, frequency: str = '1d',
+              adjust_type: str = 'none', fields: List[str] = ('open',)) -> Iterator[pd.DataFrame]:
+        """The bars of [start_date, end_date] one date window at a time, in date order; empty windows are skipped."""
+        start = pd.Timestamp(start_date).normalize()
+        end = pd.Timestamp(end_date).normalize()
+        batches = [codes[i:i + self.code_batch] for i in range(0, len(codes), self.code_batch)]
+        fields = list(fields)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            def submit(window_start: pd.Timestamp) -> Tuple[pd.Timestamp, list]:
+                window_end = min(window_start + pd.Timedelta(days=self.window_days - 1), end)
+                return window_end, [pool.submit(self._get, batch, window_start, window_end, frequency, adjust_type,
+                                                fields) for batch in batches]
+
+            window_end, futures = submit(start)
+            while futures:
+                frames = []
+                stats = []
+                for future in futures:
+                    df, seconds = future.result()
+                    if df is not None:
+                        frames.append(df)
+                    stats.append((seconds, 0 if df is None else len(df)))
+                self._adapt(stats)
+                futures = []
+                if window_end < end:
+                    # the next window downloads while the consumer handles this one
+                    window_end, futures = submit(window_end + pd.Timedelta(days=1))
+                if frames:
+                    yield pd.concat(frames).sort_index()
+
+    def fetch(self, codes: List[str], start_date: str, end_date: str, frequency: str = '1d',
+              adjust_type: str = 'none', fields: List[str] = ('open',)) -> Optional[pd.DataFrame]:
+        frames = list(self.waves(codes, start_date, end_date, frequency, adjust_type, fields))
+        if not frames:
+            return None
+        return pd.concat(frames).sort_index()
+
+
+class PriceFetcher:
+    """Process-wide rq.get_price front end.
+
+    Requests for the same (codes, start, end, frequency, adjust_type) are coalesced: one caller
+    downloads the union of the wanted fields, DEFAULT_FIELDS and any fields already cached for the
+    key while concurrent callers wait on it, and the result is kept for `ttl` seconds in an LRU of at most `max_entries` downloads.
+    """
+
+    def __init__(self, ttl: float = 600, max_entries: int = 8, fields: List[str] = DEFAULT_FIELDS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.fields = list(fields)
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[PriceKey, Tuple[float, pd.DataFrame]]' = OrderedDict()
+        self._inflight: Dict[PriceKey, Future] = {}
+        self._instruments: Dict[str, Tuple[float, List[str]]] = {}
+        self.chunked = ChunkedFetcher()
+
+    def _cached(self, key: PriceKey, fields: List[str]) -> Optional[pd.DataFrame]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        fetched_at, df = entry
+        if time.monotonic() - fetched_at >= self.ttl:
+            del self._cache[key]
+            return None
+        if not set(fields) <= set(df.columns):
+            return None
+        self._cache.move_to_end(key)
+        return df
+
+    def get_price(self, codes: List[str], start_date: str, end_date: str, frequency: str = '1d',
+                  adjust_type: str = 'none', fields: List[str] = ('open',)) -> Optional[pd.DataFrame]:
+        key = (tuple(codes), str(start_date), str(end_date), frequency, adjust_type)
+        fields = list(fields)
+        while True:
+            with self._lock:
+                df = self._cached(key, fields)
+                if df is not None:
+                    return df[fields]
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    self._inflight[key] = future
+                    entry = self._cache.get(key)
+                    want = set(fields) | set(self.fields) | (set(entry[1].columns) if entry else set())
+            if owner:
+                break
+            # another thread is downloading these bars; wait for it, then re-check the cache
+            future.result()
+
+        try:
+            df = self.chunked.fetch(list(codes), start_date, end_date, frequency, adjust_type, sorted(want))
+        except Exception as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if df is not None:
+                self._cache[key] = (time.monotonic(), df)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            del self._inflight[key]
+        future.set_result(None)
+        return None if df is None else df[fields]
+
+    def instrument_codes(self, type: str) -> List[str]:
+        with self._lock:
+            entry = self._instruments.get(type)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                return list(entry[1])
+        codes = sorted(rq.all_instruments(type=type)['order_book_id'].to_list())
+        with self._lock:
+            self._instruments[type] = (time.monotonic(), codes)
+        return list(codes)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._instruments.clear()
+
+
+fetcher = PriceFetcher()
+
+
+def get_price(codes: List[str], start_date: str, end_date: str, frequency: str = '1d',
+              adjust_type: str = 'none', fields: List[str] = ('open',)) -> Optional[pd.DataFrame]:
+    return fetcher.get_price(codes, start_date, end_date, frequency, adjust_type, fields)
+
+
+def price_waves(codes: List[str], start_date: str, end_date: str, frequency: str = '1d',
+                adjust_type: str = 'none', fields: List[str] = ('open',)) -> Iterator[pd.DataFrame]:
+    """get_price one date window at a time, uncached, for callers that store the bars as they arrive."""
+    return fetcher.chunked.waves(list(codes), start_date, end_date, frequency, adjust_type, fields)
+
+
+def instrument_codes(type: str) -> List[str]:
+    return fetcher.instrument_codes(type)
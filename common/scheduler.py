@@ -0,0 +1,259 @@
+import argparse
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from common.registry import FactorRegistry, FactorSpec, registry
+
+
+WORKERS = 4
+TIMEOUT_SECONDS = 3600
+TIMEOUTS = {
+    'StockIndustryCitics2019First': 4 * 3600,
+}
+
+# factor -> factors that must finish first when both run in the same batch
+DEPENDENCIES = {
+    # StockOpen tops up the price store the other unadjusted price factors read
+    'StockA': ['StockOpen'],
+    'StockClose': ['StockOpen'],
+    # StockBarraBeta ingests new exposure files; the other Barra factors only read the store
+    'StockBarraSize': ['StockBarraBeta'],
+    'StockBarraNLSize': ['StockBarraBeta'],
+    'StockBarraMomentum': ['StockBarraBeta'],
+    'StockBarraLiquidity': ['StockBarraBeta'],
+    'StockBarraLeverage': ['StockBarraBeta'],
+    'StockBarraEarningsYield': ['StockBarraBeta'],
+    'StockBarraBookToPrice': ['StockBarraBeta'],
+    'StockBarraResidualVolatility': ['StockBarraBeta'],
+}
+
+# when serve() loads the open factors' history panels into the snapshot hub, ahead of their 9:30 trigger
+WARM_TRIGGER = '0 20 9 * * * *'
+WARM_FACTOR = 'StockOpen'
+
+# second minute hour day month weekday year
+TRIGGER_FIELDS = [(0, 59), (0, 59), (0, 23), (1, 31), (1, 12), (0, 6), (1970, 2199)]
+
+
+class Trigger(NamedTuple):
+    """A parsed trigger_time; each field is the set of allowed values, or None for '*'."""
+    second: Optional[Set[int]]
+    minute: Optional[Set[int]]
+    hour: Optional[Set[int]]
+    day: Optional[Set[int]]
+    month: Optional[Set[int]]
+    weekday: Optional[Set[int]]
+    year: Optional[Set[int]]
+
+    def matches(self, dt: datetime) -> bool:
+        values = [dt.second, dt.minute, dt.hour, dt.day, dt.month, dt.weekday(), dt.year]
+        return all(allowed is None or value in allowed for allowed, value in zip(self, values))
+
+
+def _parse_field(field: str, low: int, high: int) -> Optional[Set[int]]:
+    if field in ('*', '?'):
+        return None
+    allowed = set()
+    for part in field.split(','):
+        base, _, step = part.partition('/')
+        if base == '*':
+            start, end = low, high
+        elif '-' in base:
+            start, end = map(int, base.split('-'))
+        else:
+            start = end = int(base)
+            if step:
+                end = high
+        allowed.update(range(start, end + 1, int(step) if step else 1))
+    return allowed
+
+
+def parse_trigger(trigger_time: str) -> Trigger:
+    """Parse a 'sec min hour day month weekday year' trigger_time as declared by the factors."""
+    fields = trigger_time.split()
+    if len(fields) != len(TRIGGER_FIELDS):
+        raise ValueError("trigger_time %r should have %d fields" % (trigger_time, len(TRIGGER_FIELDS)))
+    return Trigger(*(_parse_field(field, low, high) for field, (low, high) in zip(fields, TRIGGER_FIELDS)))
+
+
+class Scheduler:
+    """Runs a batch of factors concurrently in DEPENDENCIES order.
+
+    Ready factors go to a thread pool of `workers`. A factor that raises, returns an error or
+    outlives its timeout fails, and so does everything in the batch that depends on it. A timed-out
+    factor's thread cannot be interrupted; it is only abandoned.
+
+    Triggers come from the registry's static metadata; a factor module is imported and its class
+    instantiated only when the factor first runs.
+    """
+
+    def __init__(self, specs: FactorRegistry = registry, workers: int = WORKERS, timeout: float = TIMEOUT_SECONDS):
+        self.specs: Dict[str, FactorSpec] = dict(specs.specs)
+        self.workers = workers
+        self.timeout = timeout
+        self.triggers = {name: parse_trigger(spec.trigger_time) for name, spec in self.specs.items()}
+        self.warm_trigger = parse_trigger(WARM_TRIGGER)
+        self._factors = {}
+        self._lock = threading.Lock()
+        self._active: Set[str] = set()
+        # futures of timed-out factors whose threads are still running
+        self._stragglers: Dict[str, Future] = {}
+
+    def factor(self, name: str):
+        with self._lock:
+            if name not in self._factors:
+                self._factors[name] = self.specs[name].create()
+            return self._factors[name]
+
+    def _run(self, name: str, start_time: Optional[datetime], end_time: datetime):
+        factor = self.factor(name)
+        start = factor.first_start_time() if start_time is None else start_time
+        return factor.run(start, end_time)
+
+    def due(self, at: datetime) -> List[str]:
+        return sorted(name for name, trigger in self.triggers.items() if trigger.matches(at))
+
+    def _timeout(self, name: str) -> float:
+        return TIMEOUTS.get(name, self.timeout)
+
+    def run(self, names: List[str], start_time: datetime = None,
+            end_time: datetime = None) -> Dict[str, Tuple[Any, Optional[Exception]]]:
+        """Run `names` over [start_time, end_time]; start_time defaults to each factor's first_start_time()."""
+        end_time = datetime.now() if end_time is None else end_time
+        batch = set(names)
+        deps = {name: [dep for dep in DEPENDENCIES.get(name, []) if dep in batch] for name in names}
+        results = {}
+        pending = set(names)
+        running: Dict[Future, Tuple[str, float]] = {}
+
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while pending or running:
+                for name in sorted(pending):
+                    failed = [dep for dep in deps[name] if dep in results and results[dep][1] is not None]
+                    if failed:
+                        pending.discard(name)
+                        results[name] = (None, RuntimeError("dependency %s failed" % ', '.join(failed)))
+                    elif all(dep in results for dep in deps[name]):
+                        pending.discard(name)
+                        future = pool.submit(self._run, name, start_time, end_time)
+                        running[future] = (name, time.monotonic() + self._timeout(name))
+
+                if not running:
+                    continue
+                next_deadline = min(deadline for _, deadline in running.values())
+                done, _ = wait(list(running), timeout=max(0.0, next_deadline - time.monotonic()),
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, _ = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        traceback.print_exc()
+                        results[name] = (None, e)
+                now = time.monotonic()
+                for future, (name, deadline) in list(running.items()):
+                    if now >= deadline:
+                        del running[future]
+                        with self._lock:
+                            self._stragglers[name] = future
+                        results[name] = (None, TimeoutError("%s timed out after %ss" % (name, self._timeout(name))))
+        finally:
+            pool.shutdown(wait=False)
+        return results
+
+    def warm(self):
+        """Load the open factors' history into this process's snapshot hub, so at 9:30 only the snapshot is fetched."""
+        from common import snapshot
+        try:
+            snapshot.warm(self.factor(WARM_FACTOR).first_start_time())
+        except Exception:
+            traceback.print_exc()
+
+    def _release(self, name: str):
+        with self._lock:
+            self._active.discard(name)
+
+    def _batch(self, names: List[str]):
+        try:
+            _report(self.run(names), save=True)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            # a timed-out factor stays active until its abandoned thread ends, so no second run overlaps it
+            with self._lock:
+                stragglers = {name: self._stragglers.pop(name) for name in names if name in self._stragglers}
+                self._active.difference_update(set(names) - set(stragglers))
+            for name, future in stragglers.items():
+                future.add_done_callback(lambda _, name=name: self._release(name))
+
+    def submit(self, at: datetime):
+        """Start the batch due at `at` on its own thread, skipping factors whose previous run is still going."""
+        if WARM_FACTOR in self.specs and self.warm_trigger.matches(at):
+            threading.Thread(target=self.warm, name='warm', daemon=True).start()
+        due = self.due(at)
+        with self._lock:
+            skipped = [name for name in due if name in self._active]
+            names = [name for name in due if name not in self._active]
+            self._active.update(names)
+        if skipped:
+            print(at, "still running, skipped:", ', '.join(skipped))
+        if names:
+            threading.Thread(target=self._batch, args=(names,), name='batch %s' % at, daemon=True).start()
+
+    def serve(self):
+        """Start the due batch of every second, forever.
+
+        Batches run in the background, so a long batch does not hold up the triggers behind it, and
+        every second since the last tick is checked, so a late wake-up does not skip any.
+        """
+        last = datetime.now().replace(microsecond=0) - timedelta(seconds=1)
+        while True:
+            now = datetime.now().replace(microsecond=0)
+            while last < now:
+                last += timedelta(seconds=1)
+                self.submit(last)
+            next_tick = now + timedelta(seconds=1)
+            time.sleep(max(0.0, (next_tick - datetime.now()).total_seconds()))
+
+
+def _report(results: Dict[str, Tuple[Any, Optional[Exception]]], save: bool = False):
+    for name, (df, err) in sorted(results.items()):
+        if err is not None or df is None:
+            print(name, "error: ", err)
+            continue
+        print(name, df.shape)
+        if save:
+            from common.factor_store import factor_store
+            try:
+                factor_store.write(name, df)
+            except Exception:
+                traceback.print_exc()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="run the factors in this repo by trigger_time")
+    parser.add_argument('--at', help="run the factors triggered at this HH:MM[:SS] today")
+    parser.add_argument('--factors', nargs='*', help="run these factors")
+    parser.add_argument('--serve', action='store_true', help="keep running factors as they come due")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--timeout', type=float, default=TIMEOUT_SECONDS)
+    args = parser.parse_args()
+
+    scheduler = Scheduler(registry, args.workers, args.timeout)
+    if args.serve:
+        scheduler.serve()
+
+    if args.at:
+        at = datetime.combine(datetime.now().date(), datetime.strptime(args.at, '%H:%M:%S' if args.at.count(':') == 2 else '%H:%M').time())
+        names = scheduler.due(at)
+    elif args.factors:
+        names = args.factors
+    else:
+        names = sorted(scheduler.specs)
+
+    _report(scheduler.run(names), save=True)
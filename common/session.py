@@ -0,0 +1,68 @@
+import functools
+import threading
+from types import ModuleType
+
+
+# concurrent rqdatac calls in one process: the scheduler's WORKERS factors, each fetching on
+# ChunkedFetcher's FETCH_WORKERS threads
+POOL_SIZE = 4 * 4
+
+
+class RqSession:
+    """Process-wide rqdatac session.
+
+    Stands in for the rqdatac module: the first attribute lookup imports rqdatac and calls
+    rqdatac.init() exactly once, under a lock, so constructing factors or reading their metadata
+    never touches the network. init() is asked for a connection pool of `pool_size`, so
+    concurrent fetch threads each check out their own connection. An rqdatac without pool
+    support gets one connection, and calls through this session then take turns on a lock
+    rather than interleave on it.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, **init_kwargs):
+        self.pool_size = pool_size
+        self.init_kwargs = init_kwargs
+        self._lock = threading.Lock()
+        self._call_lock = threading.Lock()
+        self._module = None
+        self._pooled = False
+
+    @property
+    def connected(self) -> bool:
+        return self._module is not None
+
+    def connect(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    import rqdatac
+                    try:
+                        rqdatac.init(use_pool=True, max_pool_size=self.pool_size, **self.init_kwargs)
+                        self._pooled = True
+                    except TypeError:
+                        rqdatac.init(**self.init_kwargs)
+                        self._pooled = False
+                    self._module = rqdatac
+        return self._module
+
+    def reconnect(self) -> ModuleType:
+        """Drop the current session, e.g. after the server closed it, and connect again."""
+        with self._lock:
+            self._module = None
+        return self.connect()
+
+    def _serialized(self, func):
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            with self._call_lock:
+                return func(*args, **kwargs)
+        return call
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.connect(), name)
+        if not self._pooled and callable(attr) and not isinstance(attr, type):
+            return self._serialized(attr)
+        return attr
+
+
+rq = RqSession()
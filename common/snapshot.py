@@ -0,0 +1,256 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date, datetime, time as clock_time, timedelta
+from typing import (AsyncIterator, Callable, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Tuple,
+                    TypeVar)
+
+import numpy as np
+import pandas as pd
+
+from common.rqfetch import get_price, instrument_codes
+from common.session import rq
+
+
+# a warmed history panel is only trusted for this long, so later runs of the day see fresh bars
+HISTORY_TTL_SECONDS = 3600
+
+STREAM_FIELDS = ['last', 'high', 'low', 'volume']
+STREAM_INTERVAL_SECONDS = 3.0
+
+SESSIONS = [(clock_time(9, 30), clock_time(11, 30)), (clock_time(13, 0), clock_time(15, 0))]
+
+
+def is_trading_time(now: datetime = None) -> bool:
+    now = datetime.now() if now is None else now
+    return now.weekday() <= 4 and any(start <= now.time() <= end for start, end in SESSIONS)
+
+
+T = TypeVar('T')
+
+
+class SnapshotHub:
+    """Per-trading-day state shared by the 9:30 open factors.
+
+    history() memoizes, for HISTORY_TTL_SECONDS, the panels the factors need before the open, so
+    a warm() call ahead of 9:30 leaves only the snapshot to fetch at the open. opens() pulls
+    today's open prices for every stock and index with one rq.current_snapshot call, whichever
+    factor asks first. Both are single-flight: a caller that finds the same panel or the snapshot
+    already loading, e.g. a 9:30 factor behind a slow warm(), waits on that load's Future instead
+    of starting its own. Everything is dropped when the date changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = None
+        self._history: Dict[Hashable, Tuple[float, pd.DataFrame]] = {}
+        self._opens: Dict[str, float] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+
+    def _roll(self):
+        today = date.today()
+        if self._day != today:
+            self._day = today
+            self._history.clear()
+            self._opens.clear()
+
+    def _flight(self, key: Hashable, cached: Callable[[], Optional[T]], load: Callable[[], T]) -> T:
+        """cached() if it has a value, else load(); one load per key runs at a time and callers arriving
+        while it is in flight wait on its Future, then look again."""
+        while True:
+            with self._lock:
+                self._roll()
+                value = cached()
+                if value is not None:
+                    return value
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = self._inflight[key] = Future()
+            if not owner:
+                future.result()
+                continue
+            error = None
+            try:
+                value = load()
+            except BaseException as e:
+                error = e
+            with self._lock:
+                del self._inflight[key]
+            if error is not None:
+                future.set_exception(error)
+                raise error
+            future.set_result(None)
+            return value
+
+    def history(self, key: Hashable, loader: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        def cached() -> Optional[pd.DataFrame]:
+            entry = self._history.get(key)
+            if entry is None or time.monotonic() - entry[0] > HISTORY_TTL_SECONDS:
+                return None
+            return entry[1]
+
+        def load() -> pd.DataFrame:
+            df = loader()
+            with self._lock:
+                self._history[key] = (time.monotonic(), df)
+            return df
+
+        return self._flight(('history', key), cached, load).copy()
+
+    def _opens_of(self, codes: List[str]) -> Optional[pd.Series]:
+        if any(code not in self._opens for code in codes):
+            return None
+        return pd.Series({code: self._opens[code] for code in codes}, dtype=np.float64).dropna()
+
+    def _fetch_opens(self, codes: List[str]) -> pd.Series:
+        # the first fetch of the day covers every stock and index, so all open factors share it
+        wanted = instrument_codes('Stock') + instrument_codes('INDEX') + codes
+        with self._lock:
+            wanted = [code for code in dict.fromkeys(wanted) if code not in self._opens]
+        ticks = rq.current_snapshot(wanted)
+        if not isinstance(ticks, list):
+            ticks = [ticks]
+        fetched = dict.fromkeys(wanted, np.nan)
+        fetched.update({tick.order_book_id: tick.open for tick in ticks if tick is not None})
+        with self._lock:
+            self._opens.update(fetched)
+        return pd.Series({code: fetched.get(code, self._opens.get(code)) for code in codes}, dtype=np.float64).dropna()
+
+    def opens(self, codes: List[str]) -> pd.Series:
+        """Today's open price per code; codes without a tick are left out."""
+        return self._flight('opens', lambda: self._opens_of(codes), lambda: self._fetch_opens(codes))
+
+
+snapshot_hub = SnapshotHub()
+
+
+# the panel helpers import factorbase, so they are only imported by the loaders that need them; the
+# session check, the hub and the stream stay importable without it
+def unadjusted_opens(codes: List[str], start_time: datetime, end_time: datetime) -> pd.DataFrame:
+    from common.price_store import price_history
+
+    key = ('none', start_time.strftime('%Y-%m-%d'), end_time.strftime('%Y-%m-%d'), tuple(codes))
+    return snapshot_hub.history(key, lambda: price_history('open', start_time, end_time, codes))
+
+
+def pre_adjusted_opens(codes: List[str], start_time: datetime, end_time: datetime) -> pd.DataFrame:
+    start_date = start_time.strftime('%Y-%m-%d')
+    end_date = end_time.strftime('%Y-%m-%d')
+
+    def load() -> pd.DataFrame:
+        from common.panel import price_panel
+
+        df_px = get_price(codes,
+                          start_date=start_date,
+                          end_date=end_date,
+                          frequency='1d',
+                          adjust_type='pre',
+                          fields=['open'])
+        return price_panel(df_px, 'open', codes)
+
+    return snapshot_hub.history(('pre', start_date, end_date, tuple(codes)), load)
+
+
+def warm(start_time: datetime):
+    """Load the history panels of StockOpen, StockOpenReturn and IndexOpenReturn ahead of the open."""
+    now = datetime.now()
+    yesterday = now - timedelta(days=1)
+    stocks = instrument_codes('Stock')
+    indexes = instrument_codes('INDEX')
+    unadjusted_opens(stocks, start_time, now)
+    pre_adjusted_opens(stocks, start_time, yesterday)
+    pre_adjusted_opens(indexes, start_time, yesterday)
+
+
+class RqSnapshotSource:
+    def fetch(self, codes: List[str], fields: List[str]) -> Optional[pd.DataFrame]:
+        ticks = rq.current_snapshot(codes)
+        if not isinstance(ticks, list):
+            ticks = [ticks]
+        ticks = [tick for tick in ticks if tick is not None]
+        return pd.DataFrame([[getattr(tick, field) for field in fields] for tick in ticks],
+                            index=[tick.order_book_id for tick in ticks], columns=fields, dtype=np.float64)
+
+
+class FakeSnapshotSource:
+    """Replays prepared code x field snapshot frames, one per poll, then reports exhaustion with None."""
+
+    def __init__(self, frames: Iterable[pd.DataFrame]):
+        self._frames = iter(frames)
+
+    def fetch(self, codes: List[str], fields: List[str]) -> Optional[pd.DataFrame]:
+        frame = next(self._frames, None)
+        return None if frame is None else frame.reindex(index=codes, columns=fields)
+
+
+class SnapshotUpdate(NamedTuple):
+    time: datetime
+    # field -> the codes whose value changed since the previous poll, with their new values
+    changes: Dict[str, pd.Series]
+
+
+class SnapshotStream:
+    """Polls intraday snapshots every `interval` seconds during the session and yields only changed cells.
+
+    The latest value of every field for every code is kept in `latest` (field x code), so a consumer
+    can read a fresh cross-section at any time without re-running a factor over history.
+    """
+
+    def __init__(self, codes: List[str], fields: List[str] = STREAM_FIELDS, interval: float = STREAM_INTERVAL_SECONDS,
+                 source=None, session_check: Callable[[], bool] = is_trading_time):
+        self.codes = list(codes)
+        self.fields = list(fields)
+        self.interval = interval
+        self.source = RqSnapshotSource() if source is None else source
+        self.session_check = session_check
+        self.latest = pd.DataFrame(np.nan, index=self.fields, columns=self.codes)
+
+    def poll(self) -> Optional[SnapshotUpdate]:
+        """Fetch one snapshot into `latest`; None once the source is exhausted."""
+        frame = self.source.fetch(self.codes, self.fields)
+        if frame is None:
+            return None
+        new = frame.reindex(index=self.codes, columns=self.fields).T.to_numpy(dtype=np.float64)
+        old = self.latest.to_numpy()
+        changed = (new != old) & ~(np.isnan(new) & np.isnan(old)) & ~np.isnan(new)
+        self.latest = pd.DataFrame(np.where(np.isnan(new), old, new), index=self.fields, columns=self.codes)
+
+        changes = {}
+        for i, field in enumerate(self.fields):
+            if changed[i].any():
+                changes[field] = pd.Series(new[i][changed[i]], index=np.asarray(self.codes)[changed[i]])
+        return SnapshotUpdate(datetime.now(), changes)
+
+    def _until(self, until: Optional[datetime]) -> datetime:
+        return datetime.combine(date.today(), SESSIONS[-1][1]) if until is None else until
+
+    def stream(self, until: datetime = None) -> Iterator[SnapshotUpdate]:
+        """Yield updates with at least one changed cell until `until` (default today's 15:00 close)."""
+        until = self._until(until)
+        while datetime.now() <= until:
+            if self.session_check():
+                update = self.poll()
+                if update is None:
+                    return
+                if update.changes:
+                    yield update
+            time.sleep(self.interval)
+
+    async def astream(self, until: datetime = None) -> AsyncIterator[SnapshotUpdate]:
+        """stream() for asyncio consumers; polls run in the default executor."""
+        until = self._until(until)
+        loop = asyncio.get_running_loop()
+        while datetime.now() <= until:
+            if self.session_check():
+                update = await loop.run_in_executor(None, self.poll)
+                if update is None:
+                    return
+                if update.changes:
+                    yield update
+            await asyncio.sleep(self.interval)
+
+
+if __name__ == '__main__':
+    warm(datetime(2010, 1, 1))
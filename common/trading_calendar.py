@@ -0,0 +1,81 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from common import CACHE_ROOT, atomic_open
+from common.session import rq
+
+
+CALENDAR_PATH = os.path.join(CACHE_ROOT, 'trading_dates.npy')
+CALENDAR_START = datetime(2000, 1, 1)
+# the exchange publishes its calendar ahead of time; fetch a year past today and re-check weekly
+LOOKAHEAD_DAYS = 366
+REFRESH_SECONDS = 7 * 24 * 3600
+
+
+class TradingCalendar:
+    """China A-share trading dates, persisted locally and reloaded once they are REFRESH_SECONDS old.
+
+    Dates are held as a sorted, normalized DatetimeIndex: membership tests are hash lookups and
+    next/previous trading days are searchsorted lookups. The age check also runs in a long-lived
+    process such as Scheduler.serve(), so the calendar keeps reaching LOOKAHEAD_DAYS past today.
+    """
+
+    def __init__(self, path: str = CALENDAR_PATH):
+        self.path = path
+        self._dates: Optional[pd.DatetimeIndex] = None
+        # time.time() at which the held dates were fetched
+        self._fetched_at = 0.0
+
+    def _fetch(self) -> pd.DatetimeIndex:
+        end = datetime.now() + timedelta(days=LOOKAHEAD_DAYS)
+        dates = pd.DatetimeIndex(rq.get_trading_dates(start_date=CALENDAR_START, end_date=end, market='cn'))
+        dates = dates.normalize().unique().sort_values()
+        with atomic_open(self.path, 'wb') as f:
+            np.save(f, dates.to_numpy(dtype='datetime64[ns]'))
+        return dates
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        if self._dates is None or time.time() - self._fetched_at >= REFRESH_SECONDS:
+            # another process may have refreshed the file already
+            if os.path.exists(self.path) and time.time() - os.path.getmtime(self.path) < REFRESH_SECONDS:
+                self._dates = pd.DatetimeIndex(np.load(self.path))
+                self._fetched_at = os.path.getmtime(self.path)
+            else:
+                self.refresh()
+        return self._dates
+
+    def refresh(self):
+        self._dates = self._fetch()
+        self._fetched_at = time.time()
+
+    def is_trading_day(self, dt: datetime) -> bool:
+        return pd.Timestamp(dt).normalize() in self.dates
+
+    def mask(self, index: pd.Index) -> np.ndarray:
+        """Boolean mask of the entries of a datetime-like index that fall on trading days."""
+        return pd.DatetimeIndex(index).normalize().isin(self.dates)
+
+    def trading_dates(self, start_time: datetime, end_time: datetime) -> pd.DatetimeIndex:
+        dates = self.dates
+        lo = dates.searchsorted(pd.Timestamp(start_time).normalize(), 'left')
+        hi = dates.searchsorted(pd.Timestamp(end_time).normalize(), 'right')
+        return dates[lo:hi]
+
+    def next_trading_day(self, dt: datetime) -> pd.Timestamp:
+        """First trading day strictly after dt."""
+        dates = self.dates
+        return dates[dates.searchsorted(pd.Timestamp(dt).normalize(), 'right')]
+
+    def prev_trading_day(self, dt: datetime) -> pd.Timestamp:
+        """Last trading day strictly before dt."""
+        dates = self.dates
+        return dates[dates.searchsorted(pd.Timestamp(dt).normalize(), 'left') - 1]
+
+
+trading_calendar = TradingCalendar()
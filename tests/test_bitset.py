@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from common.bitset import PoolBitset
+
+
+def pool(rows, dates, codes):
+    return pd.DataFrame(rows, index=pd.DatetimeIndex(dates, name='datetime'), columns=codes, dtype=np.uint8)
+
+
+# the operands overlap on 2023-01-03 and on codes B and C only
+A = pool([[1, 1, 0], [0, 1, 1]], ['2023-01-02', '2023-01-03'], ['A', 'B', 'C'])
+B = pool([[1, 0, 1], [1, 1, 1]], ['2023-01-03', '2023-01-04'], ['B', 'C', 'D'])
+
+
+def dense(bitset):
+    df = bitset.to_frame()
+    return {(day.strftime('%m-%d'), code) for day, code in zip(*np.nonzero(df.to_numpy()))
+            for day, code in [(df.index[day], df.columns[code])]}
+
+
+def test_operators_align_on_the_union_of_dates_and_codes():
+    a, b = PoolBitset.from_frame(A), PoolBitset.from_frame(B)
+    assert (a & b).dates.strftime('%m-%d').tolist() == ['01-02', '01-03', '01-04']
+    assert (a & b).codes.tolist() == ['A', 'B', 'C', 'D']
+    assert dense(a & b) == {('01-03', 'B')}
+    assert dense(a | b) == {('01-02', 'A'), ('01-02', 'B'), ('01-03', 'B'), ('01-03', 'C'), ('01-03', 'D'),
+                            ('01-04', 'B'), ('01-04', 'C'), ('01-04', 'D')}
+    assert dense(a - b) == {('01-02', 'A'), ('01-02', 'B'), ('01-03', 'C')}
+    assert dense(b - a) == {('01-03', 'D'), ('01-04', 'B'), ('01-04', 'C'), ('01-04', 'D')}
+
+
+def test_count_and_members():
+    a, b = PoolBitset.from_frame(A), PoolBitset.from_frame(B)
+    assert (a | b).count().tolist() == [2, 3, 3]
+    assert (a - b).count().tolist() == [2, 1, 0]
+    assert (a | b).members('2023-01-03').tolist() == ['B', 'C', 'D']
+
+
+def test_round_trips_many_codes(tmp_path):
+    rng = np.random.default_rng(0)
+    codes = ['%06d.XSHE' % i for i in range(1, 5001)]
+    df = pool(rng.integers(0, 2, (20, len(codes))), pd.bdate_range('2023-01-02', periods=20), codes)
+    bitset = PoolBitset.from_frame(df)
+    assert bitset.bits.nbytes == 20 * 625
+    assert bitset.count().tolist() == df.sum(axis=1).tolist()
+
+    bitset.save(str(tmp_path / 'pool.npz'))
+    loaded = PoolBitset.load(str(tmp_path / 'pool.npz'))
+    pd.testing.assert_frame_equal(loaded.to_frame(), df, check_freq=False, check_index_type=False)
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.factor_store import FactorStore
+
+
+CODES = ['%06d.XSHE' % i for i in range(1, 201)]
+
+
+def run_frame(values, start):
+    index = pd.bdate_range(start, periods=len(values)).rename('datetime')
+    df = pd.DataFrame(values, index=index, columns=CODES[:values.shape[1]])
+    df.insert(0, 'gen_time', (index + pd.Timedelta(hours=9, minutes=30)).astype('datetime64[ns]'))
+    return df
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FactorStore(str(tmp_path))
+
+
+def test_pool_factors_are_stored_one_bit_per_cell(store, tmp_path):
+    rng = np.random.default_rng(0)
+    df = run_frame(rng.integers(0, 2, (40, 200)).astype(np.uint8), '2023-01-02')
+    store.write('Pool', df)
+
+    month = os.path.join(str(tmp_path), 'Pool', '202301')
+    assert sorted(os.listdir(month)) == ['codes.npy', 'dates.npy', 'gen_time.npy', 'values.bits.npy']
+    assert np.load(os.path.join(month, 'values.bits.npy')).shape[1] == 25
+
+    read = store.read('Pool')
+    assert (read.dtypes.iloc[1:] == np.uint8).all()
+    pd.testing.assert_frame_equal(read, df, check_freq=False, check_index_type=False, check_column_type=False)
+    assert store.read_pool('Pool').count().tolist() == df.drop(columns=['gen_time']).sum(axis=1).tolist()
+    assert store.read('Pool', codes=['000007.XSHE', 'missing']).columns.tolist() == \
+        ['gen_time', '000007.XSHE', 'missing']
+
+
+def test_appends_keep_fill_values_per_dtype(store):
+    store.write('Industry', run_frame(np.full((3, 2), 4, dtype=np.int8), '2023-01-02'))
+    store.write('Industry', run_frame(np.full((3, 3), 5, dtype=np.int8), '2023-01-05'))
+    read = store.read('Industry')
+    assert read.dtypes.iloc[1] == np.int8
+    assert read['000003.XSHE'].tolist() == [-1, -1, -1, 5, 5, 5]
+
+    store.write('Close', run_frame(np.ones((3, 2)), '2023-01-02'))
+    store.write('Close', run_frame(np.full((3, 2), 2.0), '2023-01-03'))
+    # only the rows after the last stored date are appended
+    assert store.read('Close')['000001.XSHE'].tolist() == [1.0, 1.0, 1.0, 2.0]
+    store.write('Close', run_frame(np.full((1, 2), 3.0), '2023-01-03'), overwrite=True)
+    assert store.read('Close')['000001.XSHE'].tolist() == [1.0, 3.0, 1.0, 2.0]
+    assert store.cross_section('Close', pd.Timestamp('2023-01-05'))['000002.XSHE'] == 2.0
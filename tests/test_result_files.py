@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.result_files import REVISION_ROWS, ResultFileStore
+
+
+CODES = ['%06d.XSHE' % i for i in range(1, 51)]
+
+
+def rename(columns):
+    return {column: 'datetime' if column == 'date' else column for column in columns}
+
+
+def write_csv(path, rows):
+    lines = ['date,' + ','.join(CODES)]
+    lines += ['%s,%s' % (day, ','.join('%g' % value for value in values)) for day, values in rows]
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    # a new snapshot always differs in size or mtime from the one ingested before
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def history(n, start='2023-01-02'):
+    # every other business day, so there are unused days to slot rows into
+    days = pd.bdate_range(start, periods=2 * n)[::2].strftime('%Y-%m-%d')
+    return [(day, [i + j / 100 for j in range(len(CODES))]) for i, day in enumerate(days)]
+
+
+def expected(rows):
+    return pd.DataFrame([values for _, values in rows], index=pd.DatetimeIndex([day for day, _ in rows]),
+                        columns=CODES, dtype=np.float64)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultFileStore('results', rename, root=str(tmp_path / 'store'))
+    parsed = []
+    parse = store._parse
+
+    def spy(header, body):
+        df = parse(header, body)
+        parsed.append(len(df))
+        return df
+
+    store._parse = spy
+    store.parsed = parsed
+    return store
+
+
+def check(store, rows):
+    df = store.frame(pd.Timestamp(rows[0][0]), pd.Timestamp(rows[-1][0]))
+    assert (df.dtypes == np.float32).all()
+    pd.testing.assert_frame_equal(df, expected(rows), check_names=False, check_freq=False, check_dtype=False,
+                                  check_index_type=False)
+
+
+def test_append_reads_only_the_tail(store, tmp_path):
+    path = str(tmp_path / 'snapshot.csv')
+    rows = history(60)
+    write_csv(path, rows)
+    store.ingest(path)
+    check(store, rows)
+
+    rows = history(63)
+    write_csv(path, rows)
+    store.ingest(path)
+    check(store, rows)
+    assert store.parsed == [60, REVISION_ROWS + 3]
+
+
+def test_revised_tail_is_picked_up_by_a_delta(store, tmp_path):
+    path = str(tmp_path / 'snapshot.csv')
+    rows = history(60)
+    write_csv(path, rows)
+    store.ingest(path)
+
+    rows = history(61)
+    rows[-2] = (rows[-2][0], [100.0, 200.0])
+    write_csv(path, rows)
+    store.ingest(path)
+    check(store, rows)
+    assert store.parsed == [60, REVISION_ROWS + 1]
+
+
+def test_revised_middle_row_forces_a_full_read(store, tmp_path):
+    path = str(tmp_path / 'snapshot.csv')
+    # long enough that the revised row sits well over 64KB from both the first rows and the re-read window
+    rows = history(600)
+    write_csv(path, rows)
+    store.ingest(path)
+
+    rows = history(601)
+    # same byte length, so only a hash of every earlier row can tell
+    rows[300] = (rows[300][0], [rows[300][1][0] + 1] + rows[300][1][1:])
+    write_csv(path, rows)
+    store.ingest(path)
+    check(store, rows)
+    assert store.parsed == [600, 601]
+
+
+def test_rows_out_of_order_fall_back_to_a_full_read(store, tmp_path):
+    path = str(tmp_path / 'snapshot.csv')
+    rows = history(60)
+    write_csv(path, rows)
+    store.ingest(path)
+
+    # a new date slotted in before the re-read window, then appended at the end of the file
+    late = (pd.Timestamp(rows[10][0]) + pd.offsets.BDay()).strftime('%Y-%m-%d')
+    appended = rows + [(late, [7.0] * len(CODES))]
+    write_csv(path, appended)
+    store.ingest(path)
+    check(store, sorted(appended))
+    assert store.parsed == [60, REVISION_ROWS + 1, 61]
+
+    # an out-of-order file leaves no delta anchor behind, so the next snapshot is read in full too
+    appended.append((history(61)[-1][0], [8.0] * len(CODES)))
+    write_csv(path, appended)
+    store.ingest(path)
+    check(store, sorted(appended))
+    assert store.parsed[-1] == 62
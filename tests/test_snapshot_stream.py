@@ -0,0 +1,84 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from common.snapshot import FakeSnapshotSource, SnapshotStream, is_trading_time
+
+
+CODES = ['000001.XSHE', '600000.XSHG', '600519.XSHG']
+FIELDS = ['last', 'volume']
+
+
+def frame(last, volume):
+    return pd.DataFrame({'last': last, 'volume': volume}, index=CODES, dtype=np.float64)
+
+
+def stream(frames):
+    return SnapshotStream(CODES, FIELDS, interval=0, source=FakeSnapshotSource(frames), session_check=lambda: True)
+
+
+def test_trading_time_covers_both_sessions_on_weekdays():
+    monday = pd.Timestamp('2024-01-08')
+    assert is_trading_time(monday + pd.Timedelta(hours=9, minutes=30))
+    assert is_trading_time(monday + pd.Timedelta(hours=15))
+    assert not is_trading_time(monday + pd.Timedelta(hours=12))
+    assert not is_trading_time(monday + pd.Timedelta(hours=9, minutes=29))
+    assert not is_trading_time(monday + pd.Timedelta(days=5, hours=10))
+
+
+def test_only_changed_cells_are_reported():
+    s = stream([frame([10.0, 8.0, 1700.0], [100, 200, 300]),
+                frame([10.0, 8.1, 1700.0], [100, 250, 300])])
+    first = s.poll()
+    assert set(first.changes) == set(FIELDS)
+    assert first.changes['last'].index.tolist() == CODES
+
+    second = s.poll()
+    assert set(second.changes) == set(FIELDS)
+    assert second.changes['last'].to_dict() == {'600000.XSHG': 8.1}
+    assert second.changes['volume'].to_dict() == {'600000.XSHG': 250.0}
+    assert s.latest.loc['last'].tolist() == [10.0, 8.1, 1700.0]
+
+
+def test_missing_values_keep_the_last_known_value():
+    s = stream([frame([10.0, np.nan, 1700.0], [100, np.nan, 300]),
+                frame([np.nan, 8.0, 1700.0], [np.nan, 200, 300]),
+                frame([np.nan, np.nan, np.nan], [np.nan, np.nan, np.nan])])
+    first = s.poll()
+    assert '600000.XSHG' not in first.changes['last'].index
+
+    # a code's first value is a change, a value going missing is not
+    second = s.poll()
+    assert second.changes['last'].to_dict() == {'600000.XSHG': 8.0}
+    assert s.latest.loc['last'].tolist() == [10.0, 8.0, 1700.0]
+
+    third = s.poll()
+    assert third.changes == {}
+    assert s.latest.loc['volume'].tolist() == [100.0, 200.0, 300.0]
+
+
+def test_codes_missing_from_the_source_frame_are_nan():
+    s = stream([frame([10.0, 8.0, 1700.0], [100, 200, 300]).drop(index='600519.XSHG')])
+    s.poll()
+    assert np.isnan(s.latest.loc['last', '600519.XSHG'])
+
+
+def test_stream_skips_unchanged_polls_and_stops_when_exhausted():
+    same = frame([10.0, 8.0, 1700.0], [100, 200, 300])
+    s = stream([same, same.copy(), frame([10.5, 8.0, 1700.0], [150, 200, 300])])
+    updates = list(s.stream(until=pd.Timestamp.now() + pd.Timedelta(minutes=1)))
+    assert len(updates) == 2
+    assert updates[1].changes['last'].to_dict() == {'000001.XSHE': 10.5}
+    assert s.poll() is None
+
+
+def test_astream_matches_stream():
+    frames = [frame([10.0, 8.0, 1700.0], [100, 200, 300]), frame([10.0, 8.2, 1700.0], [100, 200, 300])]
+
+    async def collect():
+        return [update async for update in stream(frames).astream(until=pd.Timestamp.now() + pd.Timedelta(minutes=1))]
+
+    updates = asyncio.run(collect())
+    assert [list(update.changes) for update in updates] == [FIELDS, ['last']]
+    assert updates[1].changes['last'].to_dict() == {'600000.XSHG': 8.2}